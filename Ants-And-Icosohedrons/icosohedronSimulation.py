@@ -1,10 +1,19 @@
 from manimlib import *
 import random
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import spsolve
+from concurrent.futures import ProcessPoolExecutor
+import os
+import json
+import hashlib
 
 # Add parent directory to Python path to import customMobject
 sys.path.insert(0, str(Path(__file__).parent.parent))
 import customMobject as cm
 
+PROJECT_PATH = r".\Ants-And-Icosohedrons"
+
 class Ant:
     def __init__(self, position):
         
@@ -13,14 +22,373 @@ class Ant:
         return random.randint(1,5)
     
 
+class AntColony:
+
+    # Every ant as a slot in a few arrays instead of one Ant each: the vertex
+    # it's on, how many steps it's taken and whether it's still walking. An ant
+    # stops (alive = False) the step it lands on target, so steps ends up as
+    # its hitting time. All the live ants move together in step(), picking a
+    # random neighbor from the mesh's adjacency table with one rng call.
+    def __init__(self, mesh, num_ants, start=0, target=None, seed=None):
+        self.neighbors, self.degrees = mesh.getAdjacency()
+        self.rng = np.random.default_rng(seed)
+        self.target = target
+        self.vertex_dtype = np.uint8 if len(self.degrees) <= 256 else np.int32
+        self.vertices = np.full(num_ants, start, dtype=self.vertex_dtype)
+        self.steps = np.zeros(num_ants, dtype=np.int32)
+        self.alive = np.ones(num_ants, dtype=bool)
+        self.visits = np.bincount(self.vertices, minlength=len(self.degrees))
+        self.time = 0
+
+    def __len__(self):
+        return len(self.vertices)
+
+    def step(self):
+        live = np.flatnonzero(self.alive)
+        if len(live) == 0:
+            return live
+        current = self.vertices[live]
+        choices = self.rng.integers(0, self.degrees[current])
+        next_vertices = self.neighbors[current, choices]
+
+        self.vertices[live] = next_vertices
+        self.steps[live] += 1
+        self.visits += np.bincount(next_vertices, minlength=len(self.degrees))
+        if self.target is not None:
+            self.alive[live[next_vertices == self.target]] = False
+        self.time += 1
+        return live
+
+    def run(self, max_steps):
+        for _ in range(max_steps):
+            if not self.alive.any():
+                break
+            self.step()
+        return self
+
+    def getHittingTimes(self):
+        return self.steps[~self.alive]
+
+    def getHittingHistogram(self, max_steps=None):
+        # histogram[k] is how many ants reached the target on exactly step k
+        max_steps = self.time if max_steps is None else max_steps
+        return np.bincount(self.getHittingTimes(), minlength=max_steps + 1)
+
+    def getVisitCounts(self):
+        # How many times any ant has stood on each vertex, start included
+        return self.visits
+
+
+
+class AntMarkovChain:
+
+    # Exact answers for the walk AntColony samples (every step goes to one of
+    # the current vertex's neighbors with equal chance), for checking the
+    # simulation and drawing the ground truth curves. get() keeps one chain
+    # per graph and each chain keeps the results it has already solved.
+    cached_chains = {}
+
+    def __init__(self, mesh):
+        self.neighbors, self.degrees = mesh.getAdjacency()
+        num_vertices = len(self.degrees)
+        rows = np.repeat(np.arange(num_vertices), self.degrees)
+        cols = self.neighbors[self.neighbors >= 0]
+        self.transitions = sparse.csr_matrix(
+            (1 / self.degrees[rows], (rows, cols)),
+            shape=(num_vertices, num_vertices)
+        )
+        self.transposed = self.transitions.T.tocsr()
+        self.hitting_times = {}
+        self.step_distributions = {}
+
+    @classmethod
+    def get(cls, mesh):
+        key = (len(mesh.vertices), mesh.getEdges().tobytes())
+        if key not in cls.cached_chains:
+            cls.cached_chains[key] = cls(mesh)
+        return cls.cached_chains[key]
+
+    def __len__(self):
+        return len(self.degrees)
+
+    def getStationaryDistribution(self):
+        # For a walk that picks neighbors evenly this is just each vertex's share of the degrees
+        return self.degrees / self.degrees.sum()
+
+    def getExpectedHittingTimes(self, target):
+        # times[v] = 1 + the average of times over v's neighbors, with times[target] = 0
+        if target not in self.hitting_times:
+            others = np.flatnonzero(np.arange(len(self)) != target)
+            system = sparse.identity(len(others), format='csc') - self.transitions[others][:, others].tocsc()
+            times = np.zeros(len(self))
+            times[others] = spsolve(system, np.ones(len(others)))
+            self.hitting_times[target] = times
+        return self.hitting_times[target]
+
+    def getExpectedReturnTime(self, vertex):
+        return 1 + self.transitions[vertex].dot(self.getExpectedHittingTimes(vertex))[0]
+
+    def getStepDistribution(self, start, k):
+        # Where an ant that started on start is after exactly k steps, as k
+        # sparse mat-vec steps from start. Only the latest step is kept per
+        # start, so asking for k, k+1, k+2... just carries on from the last one.
+        last_k, distribution = self.step_distributions.get(start, (None, None))
+        if last_k is None or last_k > k:
+            last_k = 0
+            distribution = np.zeros(len(self))
+            distribution[start] = 1
+        for _ in range(k - last_k):
+            distribution = self.transposed.dot(distribution)
+        self.step_distributions[start] = (k, distribution)
+        return distribution.copy()
+
+    def getHittingTimeDistribution(self, start, target, max_steps):
+        # probabilities[k] is the chance an ant from start first lands on target
+        # on step k, the exact version of AntColony.getHittingHistogram / len
+        distribution = np.zeros(len(self))
+        distribution[start] = 1
+        probabilities = np.zeros(max_steps + 1)
+        for k in range(1, max_steps + 1):
+            distribution = self.transposed.dot(distribution)
+            probabilities[k] = distribution[target]
+            distribution[target] = 0
+        return probabilities
+
+
+class AntWalkStats:
+
+    # What a batch of ants leaves behind once it's done: small enough to send
+    # back from a worker process, and adding two of them together gives the
+    # same numbers as one batch with all of their ants
+    def __init__(self, hitting_histogram, visit_counts, unfinished=0):
+        self.hitting_histogram = np.asarray(hitting_histogram, dtype=np.int64)
+        self.visit_counts = np.asarray(visit_counts, dtype=np.int64)
+        self.unfinished = unfinished
+
+    @classmethod
+    def fromColony(cls, colony, max_steps):
+        return cls(
+            colony.getHittingHistogram(max_steps),
+            colony.getVisitCounts(),
+            int(colony.alive.sum())
+        )
+
+    def __len__(self):
+        return int(self.hitting_histogram.sum()) + self.unfinished
+
+    def merge(self, other):
+        return AntWalkStats(
+            self.hitting_histogram + other.hitting_histogram,
+            self.visit_counts + other.visit_counts,
+            self.unfinished + other.unfinished
+        )
+
+    def getHittingProbabilities(self):
+        return self.hitting_histogram / len(self)
+
+    def getMeanHittingTime(self):
+        # Only over the ants that made it, so check unfinished is ~0 first
+        steps = np.arange(len(self.hitting_histogram))
+        return (steps * self.hitting_histogram).sum() / self.hitting_histogram.sum()
+
+def simulateShard(mesh, num_ants, start, target, max_steps, seed):
+    colony = AntColony(mesh, num_ants, start, target, seed).run(max_steps)
+    return AntWalkStats.fromColony(colony, max_steps)
+
+class AntSimulationRunner:
+
+    # Splits a big run into fixed size shards and simulates them in a pool of
+    # worker processes. Every shard gets its own stream from spawning the
+    # master seed, and the shards are cut the same way however many workers
+    # there are, so a given seed always gives the same merged stats.
+    def __init__(self, mesh, start=0, target=None, seed=0, shard_size=100_000):
+        self.mesh = mesh
+        self.start = start
+        self.target = target
+        self.seed = seed
+        self.shard_size = shard_size
+
+    def getShards(self, num_ants):
+        num_shards = -(-num_ants // self.shard_size)
+        if num_shards == 0:
+            return [], []
+        sizes = [self.shard_size] * (num_shards - 1) + [num_ants - self.shard_size * (num_shards - 1)]
+        seeds = np.random.SeedSequence(self.seed).spawn(num_shards)
+        return sizes, seeds
+
+    def run(self, num_ants, max_steps, max_workers=None):
+        sizes, seeds = self.getShards(num_ants)
+        if len(sizes) == 0:
+            return AntWalkStats(np.zeros(max_steps + 1), np.zeros(len(self.mesh.vertices)))
+        max_workers = min(max_workers or os.cpu_count() or 1, len(sizes))
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(
+                simulateShard,
+                [self.mesh] * len(sizes),
+                sizes,
+                [self.start] * len(sizes),
+                [self.target] * len(sizes),
+                [max_steps] * len(sizes),
+                seeds
+            ))
+
+        stats = results[0]
+        for result in results[1:]:
+            stats = stats.merge(result)
+        return stats
+
+
+class AntTrajectoryRecorder:
+
+    # Writes a run to disk a frame (every ant's vertex after one step) at a
+    # time, into fixed size .npy chunks that are memory mapped while they're
+    # being filled, so nothing but the chunk being written is held in memory.
+    # meta.json is written last by close(), so a half written run never loads.
+    def __init__(self, directory, num_ants, num_vertices, chunk_frames=256):
+        self.directory = directory
+        self.num_ants = num_ants
+        self.num_vertices = num_vertices
+        self.chunk_frames = chunk_frames
+        self.dtype = np.uint8 if num_vertices <= 256 else np.uint16
+        self.num_frames = 0
+        self.chunk = None
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, 'meta.json')
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+    def addFrame(self, vertices):
+        row = self.num_frames % self.chunk_frames
+        if row == 0:
+            self.flush()
+            chunk_path = os.path.join(self.directory, f"chunk_{self.num_frames // self.chunk_frames:05d}.npy")
+            self.chunk = np.lib.format.open_memmap(
+                chunk_path, mode='w+', dtype=self.dtype,
+                shape=(self.chunk_frames, self.num_ants)
+            )
+        self.chunk[row] = vertices
+        self.num_frames += 1
+
+    def record(self, colony, num_steps):
+        # The starting positions plus one frame per step
+        self.addFrame(colony.vertices)
+        for _ in range(num_steps):
+            colony.step()
+            self.addFrame(colony.vertices)
+        return self
+
+    def flush(self):
+        if self.chunk is not None:
+            self.chunk.flush()
+            self.chunk = None
+
+    def close(self):
+        self.flush()
+        meta = {
+            'num_ants': self.num_ants,
+            'num_vertices': self.num_vertices,
+            'num_frames': self.num_frames,
+            'chunk_frames': self.chunk_frames,
+            'dtype': np.dtype(self.dtype).name,
+        }
+        with open(os.path.join(self.directory, 'meta.json'), 'w') as meta_json:
+            json.dump(meta, meta_json)
+
+
+class AntTrajectory:
+
+    # Reads back a run written by AntTrajectoryRecorder. Chunks are opened as
+    # read only memory maps the first time a frame in them is asked for, so
+    # the OS only pages in the frames actually being drawn. Pass num_vertices
+    # to make sure the run was recorded on a mesh the same size as the one
+    # it's about to be drawn on.
+    def __init__(self, directory, num_vertices=None):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json'), 'r') as meta_json:
+            meta = json.load(meta_json)
+        if num_vertices is not None and meta['num_vertices'] != num_vertices:
+            raise ValueError(
+                f"{directory} was recorded on a mesh with {meta['num_vertices']} vertices, not {num_vertices}"
+            )
+        self.num_ants = meta['num_ants']
+        self.num_vertices = meta['num_vertices']
+        self.num_frames = meta['num_frames']
+        self.chunk_frames = meta['chunk_frames']
+        self.dtype = np.dtype(meta['dtype'])
+        self.chunks = {}
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, 'meta.json'))
+
+    def __len__(self):
+        return self.num_frames
+
+    def getChunk(self, chunk_index):
+        if chunk_index not in self.chunks:
+            chunk_path = os.path.join(self.directory, f"chunk_{chunk_index:05d}.npy")
+            self.chunks[chunk_index] = np.load(chunk_path, mmap_mode='r')
+        return self.chunks[chunk_index]
+
+    def getFrame(self, index):
+        if index < 0:
+            index += self.num_frames
+        if not 0 <= index < self.num_frames:
+            raise IndexError(f"frame {index} out of range for {self.num_frames} frames")
+        return self.getChunk(index // self.chunk_frames)[index % self.chunk_frames]
+
+    def getFrames(self, start, stop):
+        # Frames start up to (not including) stop as one array, copied out of the chunks
+        stop = min(stop, self.num_frames)
+        parts = []
+        for chunk_index in range(start // self.chunk_frames, -(-stop // self.chunk_frames)):
+            chunk_start = chunk_index * self.chunk_frames
+            lo = max(start, chunk_start) - chunk_start
+            hi = min(stop, chunk_start + self.chunk_frames) - chunk_start
+            parts.append(self.getChunk(chunk_index)[lo:hi])
+        if len(parts) == 0:
+            return np.zeros((0, self.num_ants), dtype=self.dtype)
+        return np.concatenate(parts)
+
+    def iterFrames(self, start=0, stop=None):
+        stop = self.num_frames if stop is None else min(stop, self.num_frames)
+        for index in range(start, stop):
+            yield self.getFrame(index)
+
 
 class MainSim(ThreeDScene):
     def construct(self):
-        self.titleSequence(self)
+        self.titleSequence()
+        self.mainSim()
 
 
     def titleSequence(self):
         title = TexText("")
     
     def mainSim(self):
-        pass
\ No newline at end of file
+        icosahedron = cm.Icosahedron(size=2)
+        trajectory = self.loadTrajectory(icosahedron.mesh, 50_000, 60)
+
+        # All the ants are one point cloud, moved by a single updater that
+        # reads the recorded run two frames at a time
+        swarm = cm.AntSwarm(icosahedron.vertices, trajectory.getFrame(0))
+
+        self.frame.set_euler_angles(60*DEGREES, 0, 30*DEGREES)
+        self.play(*icosahedron.facesCreation())
+        self.add(swarm)
+        steps_per_second = 2
+        swarm.follow_trajectory(trajectory, steps_per_second)
+        self.wait((len(trajectory) - 1) / steps_per_second)
+        swarm.clear_updaters()
+
+    def loadTrajectory(self, mesh, num_ants, num_steps, start=0, seed=0):
+        # Recorded once per mesh and set of parameters, after that every render
+        # (at any resolution) just replays the same run from disk
+        mesh_hash = hashlib.sha256(mesh.getEdges().tobytes()).hexdigest()[:12]
+        mesh_key = f"{len(mesh.vertices)}v_{mesh_hash}"
+        run_path = fr'{PROJECT_PATH}\ant_runs\{mesh_key}_{num_ants}_{num_steps}_{start}_{seed}'
+        if not AntTrajectory.exists(run_path):
+            colony = AntColony(mesh, num_ants, start, seed=seed)
+            recorder = AntTrajectoryRecorder(run_path, num_ants, len(mesh.vertices))
+            recorder.record(colony, num_steps).close()
+        return AntTrajectory(run_path, len(mesh.vertices))
\ No newline at end of file
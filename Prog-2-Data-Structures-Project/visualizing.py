@@ -1,7 +1,6 @@
 from manimlib import *
 import json
 import csv
-import operator
 import sys
 
 from pathlib import Path
@@ -10,65 +9,56 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 import customMobject as cm
 import datetime
+import numpy as np
+import os
+import shutil
+from array import array
 
 PROJECT_PATH = r".\Prog-2-Data-Structures-Project"
 
-class Main(ThreeDScene):
-    def construct(self):
-        #formating()
-        with open(r".\formatted.json", 'r') as formatted_json:
-            data = json.load(formatted_json)
+ITEMS_PATH = fr'{PROJECT_PATH}\20191226-items.csv'
+REVIEWS_PATH = fr'{PROJECT_PATH}\20191226-reviews.csv'
+REVIEW_CACHE_PATH = fr'{PROJECT_PATH}\review_cache'
+
+class Main(cm.SegmentedScene, ThreeDScene):
+    # Each part starts and ends on an empty scene, so they can be rendered
+    # and cached as separate chunks (see the bottom of this file)
+    segments = ["showTitle", "part1BarChartAnalysis", "part2TimeSeriesAnalysis"]
+
+    def setupSegments(self):
+        reviews = loadReviewColumns(ITEMS_PATH, REVIEWS_PATH, REVIEW_CACHE_PATH)
         self.frame.set_euler_angles(0,0,0)
 
-        self.data = data
+        self.reviews = reviews
+        self.chart_cache = cm.ChartCache(fr'{PROJECT_PATH}\chart_cache')
         self.setupData()
-
-        self.showTitle()
-        self.part1BarChartAnalysis()
-        self.part2TimeSeriesAnalysis()
+        # Segment workers (MANIM_SEGMENT set) read the labels back from the svg
+        # cache the parent warmed before starting them
+        if os.environ.get("MANIM_SEGMENT") is None:
+            cm.label_cache.warm(getChartLabels(reviews))
         
     def setupData(self):
 
-        averaged_scores = {}
-        for brand in self.data:
-            if brand != 'brand':
-                average_score = getAverageReviewScore(brand, self.data)
-                averaged_scores[brand] = average_score
+        averaged_scores = self.reviews.getAverageScores()
 
         scores = list(averaged_scores.values())
-        brands = list(averaged_scores.keys())
-
-        
-        original_brand_at_0 = brands[0]
-        brands[0] = 'Unknown'
+        original_brand_at_0 = list(averaged_scores.keys())[0]
+        brands = getDisplayBrands(averaged_scores.keys())
 
         color_palette = [BLUE, RED, GREEN, YELLOW, WHITE, ORANGE, TEAL, MAROON, PINK, GOLD]
         brand_colors = {brand: color_palette[i % len(color_palette)] for i, brand in enumerate(brands)}
 
-        
-        sorted_averaged_scores = dict(sorted(averaged_scores.items(), key=operator.itemgetter(1)))
-        sorted_scores = list(sorted_averaged_scores.values())
-        sorted_scores.sort(reverse=True)
-
-        sorted_brands = []
-        reference_items = averaged_scores.items()
-        for score in sorted_scores:
-            for pair in reference_items:
-                pair = list(pair)
-                if score == pair[1]:
-                    sorted_brands.append(pair[0])
-
-        
-        for i, brand in enumerate(sorted_brands):
-            if brand == original_brand_at_0:
-                sorted_brands[i] = 'Unknown'
-                break
+        # sorted_order[k] is the index (into brands/scores) of the k-th best brand
+        sorted_order = rankScores(scores)
+        sorted_brands = [brands[i] for i in sorted_order]
+        sorted_scores = [scores[i] for i in sorted_order]
 
         
         self.brands = brands
         self.scores = scores
         self.sorted_brands = sorted_brands
         self.sorted_scores = sorted_scores
+        self.sorted_order = sorted_order
         self.brand_colors = brand_colors
         self.original_brand_at_0 = original_brand_at_0
 
@@ -87,25 +77,19 @@ class Main(ThreeDScene):
 
         # Create charts
         colors = [self.brand_colors[brand] for brand in self.brands]
-        average_score_chart = cm.BarGraph(
+        average_score_chart = self.chart_cache.build(
+            cm.BarGraph,
             values=self.scores,
             bar_names=self.brands,
             y_range=[0,5,1],
-            bar_colors=colors
-        )
-
-        sorted_colors = [self.brand_colors[brand] for brand in self.sorted_brands]
-        sorted_score_chart = cm.BarGraph(
-            values=self.sorted_scores,
-            bar_names=self.sorted_brands,
-            y_range=[0,5,1],
-            bar_colors=sorted_colors
+            bar_colors=colors,
+            batched=True
         )
 
         
         self.part1_initial_state = {
-            'title': first_analysis_title.copy(),
-            'chart': average_score_chart.copy(),
+            'title': cm.MobjectSnapshot(first_analysis_title),
+            'chart': cm.MobjectSnapshot(average_score_chart),
             'frame_angle': self.frame.get_euler_angles(),
             'frame_scale': self.frame.get_scale()
         }
@@ -123,20 +107,8 @@ class Main(ThreeDScene):
         self.wait()
 
         
-        animations = []
-        for i, sorted_brand in enumerate(self.sorted_brands):
-            original_index = self.brands.index(sorted_brand)
-            original_bar = average_score_chart.bars[original_index]
-            original_label = average_score_chart.labels[original_index]
-            original_value = average_score_chart.value_labels[original_index]
-
-            target_bar = sorted_score_chart.bars[i]
-            target_label = sorted_score_chart.labels[i]
-            target_value = sorted_score_chart.value_labels[i]
-
-            animations.append(original_bar.animate.move_to(target_bar.get_center()))
-            animations.append(original_label.animate.move_to(target_label.get_center()))
-            animations.append(original_value.animate.move_to(target_value.get_center()))
+        # All the bars are one mobject, so they get moved by index
+        animations = average_score_chart.get_reorder_animations(self.sorted_order)
 
         self.play(*animations)
         self.wait()
@@ -164,40 +136,28 @@ class Main(ThreeDScene):
             else:
                 brand_name_mapping[brand] = brand
 
-        review_over_time_graphs = {}
-        chart_lines = VGroup()
-        for brand in self.brands:
-            
-            data_brand = brand_name_mapping[brand]
-            time_data = getAverageReviewsByTimePeriod(self.data, data_brand)
-            times = list(time_data.keys())
-            average_scores = list(time_data.values())
-
-            if brand == "Samsung":
-                review_timeline = cm.LineChart(
-                    times,
-                    average_scores,
-                    [0,5,1],
-                    line_color=self.brand_colors[brand]
-                )
-            else:
-                review_timeline = cm.LineChart(
-                    times,
-                    average_scores,
-                    [0,5,1],
-                    line_color=self.brand_colors[brand],
-                    show_axes=False
-                )
-            try:
-                chart_lines.add(review_timeline.line)
-            except AttributeError:
-                continue
+        # Every brand and the overall average in one pass over the reviews
+        brand_time_data, all_time_data = self.reviews.getAveragesByTimePeriod()
 
-            review_over_time_graphs[brand] = review_timeline
+        # All brands share the overall time axis, one row of scores per brand
+        # (NaN for months a brand has no reviews in)
+        times = list(all_time_data.keys())
+        brand_scores = [
+            [brand_time_data.get(brand_name_mapping[brand], {}).get(time, np.nan) for time in times]
+            for brand in self.brands
+        ]
+        review_over_time_chart = self.chart_cache.build(
+            cm.MultiLineChart,
+            times,
+            brand_scores,
+            [0,5,1],
+            line_colors=[self.brand_colors[brand] for brand in self.brands],
+            series_names=self.brands
+        )
 
         self.part2_initial_state = {
-            'title': time_series_first_title.copy(),
-            'graphs': {brand: graph.copy() for brand, graph in review_over_time_graphs.items()},
+            'title': cm.MobjectSnapshot(time_series_first_title),
+            'chart': cm.MobjectSnapshot(review_over_time_chart),
             'frame_angle': self.frame.get_euler_angles(),
             'frame_scale': self.frame.get_scale()
         }
@@ -205,13 +165,14 @@ class Main(ThreeDScene):
         self.play(Write(time_series_first_title))
         self.wait()
         self.play(
-            ShowCreation(review_over_time_graphs["Samsung"].y_axis),
-            ShowCreation(review_over_time_graphs["Samsung"].x_axis),
-            FadeIn(review_over_time_graphs["Samsung"].y_axis_labels),
-            FadeIn(review_over_time_graphs["Samsung"].x_axis_labels),
+            ShowCreation(review_over_time_chart.y_axis),
+            ShowCreation(review_over_time_chart.x_axis),
+            FadeIn(review_over_time_chart.y_axis_labels),
+            FadeIn(review_over_time_chart.x_axis_labels),
         )
         self.wait()
-        self.play(ShowCreation(review_over_time_graphs["Samsung"].line))
+        samsung_line = review_over_time_chart.get_series_line("Samsung")
+        self.play(ShowCreation(samsung_line))
         self.wait()
 
         legend = cm.Key(self.brands, self.brand_colors)
@@ -219,52 +180,39 @@ class Main(ThreeDScene):
         legend.scale(0.7)
         legend.shift(DOWN*0.7)
 
-        creation_animations = []
-        for brand in self.brands:
-            if brand != "Samsung":
-                creation_animations.append(ShowCreation(review_over_time_graphs[brand].line))
+        other_lines = [
+            review_over_time_chart.get_series_line(brand)
+            for brand in self.brands if brand != "Samsung"
+        ]
+        creation_animations = [ShowCreation(line) for line in other_lines]
 
         self.play(
             *creation_animations,
             ReplacementTransform(time_series_first_title, time_series_second_title),
             ShowCreation(legend)
         )
+        # Swap the per-brand copies used for drawing for the one shared buffer
+        self.remove(samsung_line, *other_lines)
+        self.add(review_over_time_chart.lines)
         self.wait()
 
         depth_spacing = 0.5
-        shift_animations = []
-        for i, brand in enumerate(self.brands):
-            
-            z_position = i * depth_spacing - (len(self.brands) - 1) * depth_spacing / 2
-            shift_animations.append(
-                review_over_time_graphs[brand].animate.shift(OUT * z_position)
-            )
-
         self.play(
-            *shift_animations,
+            review_over_time_chart.lines.animate.set_series_offsets(review_over_time_chart.get_depth_offsets(depth_spacing)),
             self.frame.animate.set_euler_angles(80*DEGREES,-70*DEGREES,-85*DEGREES).scale(1.5),
             run_time=2
         )
         self.wait()
 
-        return_animations = []
-        for i, brand in enumerate(self.brands):
-            z_position = i * depth_spacing - (len(self.brands) - 1) * depth_spacing / 2
-            return_animations.append(
-                review_over_time_graphs[brand].animate.shift(OUT * -z_position)
-            )
-
         self.play(
-            *return_animations,
+            review_over_time_chart.lines.animate.set_series_offsets(review_over_time_chart.get_depth_offsets(0)),
             self.frame.animate.set_euler_angles(0,0,0).scale(2/3),
             run_time=2
         )
         self.wait()
 
-        all_time_data = getAverageReviewsByTimePeriod(self.data)
-        times = list(all_time_data.keys())
         scores = list(all_time_data.values())
-        average_line_chart = cm.LineChart(times, scores, [0,5,1], line_color=WHITE, show_axes=False)
+        average_line_chart = self.chart_cache.build(cm.LineChart, times, scores, [0,5,1], line_color=WHITE, show_axes=False, markers="cloud")
 
         merge_title = TexText("All Brands Merge to Overall Average")
         merge_title.to_edge(UP)
@@ -278,15 +226,14 @@ class Main(ThreeDScene):
 
         removal_animations = []
         for brand in self.brands:
-            line = review_over_time_graphs[brand].line
             removal_animations.append(
                 ShowPassingFlash(
-                    line.copy().set_color(BLACK).set_stroke(width=8),
+                    review_over_time_chart.get_series_line(brand).set_color(BLACK).set_stroke(width=8),
                     time_width=0.5,
                     run_time=3
                 )
             )
-            removal_animations.append(FadeOut(line))
+        removal_animations.append(FadeOut(review_over_time_chart.lines))
 
         self.play(*removal_animations, ShowCreation(average_line_chart.line), run_time=3)
         self.wait()
@@ -294,90 +241,437 @@ class Main(ThreeDScene):
         self.play(
             Uncreate(average_line_chart.line),
             Uncreate(merge_title),
-            Uncreate(review_over_time_graphs['Samsung'].y_axis),
-            Uncreate(review_over_time_graphs['Samsung'].x_axis),
-            FadeOut(review_over_time_graphs['Samsung'].y_axis_labels),
-            FadeOut(review_over_time_graphs['Samsung'].x_axis_labels),
+            Uncreate(review_over_time_chart.y_axis),
+            Uncreate(review_over_time_chart.x_axis),
+            FadeOut(review_over_time_chart.y_axis_labels),
+            FadeOut(review_over_time_chart.x_axis_labels),
         )
         self.embed()
 
-def getAverageReviewScore(brand, data):
-    temp_scores = []
-    for product in data[brand]:
-        for review in data[brand][product]:
-            score = review[0]
-            temp_scores.append(int(score))
-    mean = sum(temp_scores) / len(temp_scores)
-    mean = round(mean, 3)
-    return mean
-
-def getAverageReviewsByTimePeriod(data, brand=None):
-    reviews_by_date = {}
-
-    for brand_name in data:
-
-        # Handling the first row and the 
-        if brand_name == 'brand':
-            continue
-        if brand != None and brand_name != brand:
-            continue
-
-        for product in data[brand_name]:
-            for review in data[brand_name][product]:
-                score = int(review[0])
-                date_str = review[1]
-     
+def getDisplayBrands(brands):
+    # The charts show the first brand as 'Unknown'
+    brands = list(brands)
+    if len(brands) > 0:
+        brands[0] = 'Unknown'
+    return brands
+
+def getChartLabels(reviews):
+    # Every string the charts will turn into a TexText, so they can all be
+    # compiled up front instead of one at a time while building the scene
+    y_min, y_max, y_step = [0, 5, 1]
+    num_ticks = int((y_max - y_min) / y_step) + 1
+    chart_labels = {str(y_min + i * y_step) for i in range(num_ticks)}
+    chart_labels.update(getDisplayBrands(reviews.getBrands()))
+    chart_labels.update(reviews.getAverageReviewsByTimePeriod().keys())
+    return chart_labels
+
+def rankScores(scores, descending=True):
+    # Permutation that sorts the scores, ties keep their original order
+    scores = np.asarray(scores, dtype=float)
+    return np.argsort(-scores if descending else scores, kind='stable')
+
+PERIODS = ('day', 'week', 'month', 'quarter')
+
+MISSING_DAY = np.iinfo(np.int32).min
+EPOCH = datetime.date(1970, 1, 1)
+MONTH_NUMBERS = {
+    datetime.date(2000, month, 1).strftime("%B"): month
+    for month in range(1, 13)
+}
+
+class ReviewDateParser:
+
+    # Review dates look like "December 26, 2019". There are only a few thousand
+    # distinct ones, so each is parsed once and every repeat is a dict lookup.
+    # Anything that can't be read comes back as None / MISSING_DAY and is
+    # counted in self.malformed instead of raising.
+    def __init__(self, date_format="%B %d, %Y"):
+        self.date_format = date_format
+        self.parsed_dates = {}
+        self.malformed = 0
+
+    def parseUncached(self, date_str):
+        if date_str is None:
+            return None
+        # Fast path for "Month day, year" without going through strptime
+        parts = date_str.split()
+        if len(parts) == 3 and parts[0] in MONTH_NUMBERS:
+            try:
+                return datetime.date(int(parts[2]), MONTH_NUMBERS[parts[0]], int(parts[1].rstrip(',')))
+            except ValueError:
+                pass
+        try:
+            return datetime.datetime.strptime(date_str.strip(), self.date_format).date()
+        except ValueError:
+            return None
+
+    def parse(self, date_str):
+        if date_str in self.parsed_dates:
+            date_obj = self.parsed_dates[date_str]
+        else:
+            date_obj = self.parseUncached(date_str)
+            self.parsed_dates[date_str] = date_obj
+        if date_obj is None:
+            self.malformed += 1
+        return date_obj
+
+    def toDay(self, date_str):
+        date_obj = self.parse(date_str)
+        if date_obj is None:
+            return MISSING_DAY
+        return (date_obj - EPOCH).days
+
+    def toDays(self, date_strs):
+        # Vectorized: parse each distinct string once, then broadcast back
+        unique_strs, inverse = np.unique(np.asarray(date_strs, dtype=str), return_inverse=True)
+        unique_days = np.array([
+            MISSING_DAY if date_obj is None else (date_obj - EPOCH).days
+            for date_obj in map(self.getCachedDate, unique_strs)
+        ], dtype=np.int32)
+        days = unique_days[inverse.reshape(-1)]
+        self.malformed += int(np.count_nonzero(days == MISSING_DAY))
+        return days
+
+    def getCachedDate(self, date_str):
+        date_str = str(date_str)
+        if date_str not in self.parsed_dates:
+            self.parsed_dates[date_str] = self.parseUncached(date_str)
+        return self.parsed_dates[date_str]
+
+
+def readItemBrands(items_path):
+    asin_to_brand = {}
+    brands = {}
+    with open(items_path, 'r', encoding='utf-8') as item_csv:
+        item_csv_reader = csv.reader(item_csv)
+        next(item_csv_reader, None)
+        for item in item_csv_reader:
+            asin_to_brand[item[0]] = item[1]
+            brands[item[1]] = None
+    return asin_to_brand, list(brands)
+
+class ReviewStream:
+
+    # Hash join of the items file onto the reviews file by asin, one review at
+    # a time. Iterating yields (brand, asin, score, date string) and never holds
+    # more than the current row; rows whose score can't be read are counted in
+    # skipped_rows instead of raising.
+    def __init__(self, items_path, reviews_path):
+        self.asin_to_brand, self.brands = readItemBrands(items_path)
+        self.reviews_path = reviews_path
+        self.skipped_rows = 0
+
+    def __iter__(self):
+        with open(self.reviews_path, 'r', encoding='utf-8') as review_csv:
+            review_csv_reader = csv.reader(review_csv)
+            next(review_csv_reader, None)
+            for review in review_csv_reader:
+                brand = self.asin_to_brand.get(review[0])
+                if brand is None:
+                    continue
                 try:
-                    date_obj = datetime.datetime.strptime(date_str, "%B %d, %Y")
-                    period = date_obj.strftime("%Y-%m") 
-
-                    if period not in reviews_by_date:
-                        reviews_by_date[period] = []
-                    reviews_by_date[period].append(score)
-                except ValueError:
-    
+                    score = int(review[2])
+                except (ValueError, IndexError):
+                    self.skipped_rows += 1
                     continue
+                yield brand, review[0], score, review[3] if len(review) > 3 else None
+
+
+class ReviewAggregates:
+
+    # Running sums and counts instead of the reviews themselves, so memory
+    # only grows with the number of brands and distinct days, not reviews.
+    # Totals are kept per day, so any of PERIODS can be rolled up afterwards.
+    # Same averaging API as ReviewColumns.
+    def __init__(self, brands=()):
+        self.brand_totals = {brand: [0, 0] for brand in brands}
+        self.day_totals = {None: {}}
+        self.skipped_rows = 0
+        self.malformed_dates = 0
+
+    def add(self, brand, score, day=MISSING_DAY):
+        brand_total = self.brand_totals.setdefault(brand, [0, 0])
+        brand_total[0] += score
+        brand_total[1] += 1
+
+        if day == MISSING_DAY:
+            return
+        for key in (brand, None):
+            day_total = self.day_totals.setdefault(key, {}).setdefault(day, [0, 0])
+            day_total[0] += score
+            day_total[1] += 1
+
+    def getBrands(self):
+        # Brands in the same order as the items file, leaving out any without reviews
+        return [brand for brand, (_, count) in self.brand_totals.items() if count > 0]
+
+    def getAverageScore(self, brand):
+        total, count = self.brand_totals[brand]
+        return round(total / count, 3)
+
+    def getAverageScores(self):
+        return {brand: self.getAverageScore(brand) for brand in self.getBrands()}
+
+    def getAverageReviewsByTimePeriod(self, brand=None, period="month"):
+        day_totals = self.day_totals.get(brand, {})
+        if len(day_totals) == 0:
+            return {}
+        days = np.fromiter(day_totals.keys(), dtype=np.int64, count=len(day_totals))
+        sums = np.array(list(day_totals.values()), dtype=float)
+        labels, period_ids = getPeriodBuckets(days, period)
+        totals = np.bincount(period_ids, weights=sums[:, 0], minlength=len(labels))
+        counts = np.bincount(period_ids, weights=sums[:, 1], minlength=len(labels))
+        return {
+            label: round(float(total / count), 3)
+            for label, total, count in zip(labels, totals, counts)
+        }
 
-    averages_over_time = {}
-    for period, scores in sorted(reviews_by_date.items()):
-        averages_over_time[period] = round(sum(scores) / len(scores), 3)
-
-    return averages_over_time
-
-
-
-def formating():
-    with open(fr'{PROJECT_PATH}\20191226-items.csv', 'r', encoding='utf-8') as item_csv:
-        item_csv_reader = csv.reader(item_csv)
-
-        with open(fr'{PROJECT_PATH}\20191226-reviews.csv', 'r', encoding='utf-8') as review_csv:
-            review_csv_reader = csv.reader(review_csv)
-            condenced_review_dict = {}
+    def getAveragesByTimePeriod(self, period="month"):
+        averages_by_brand = {
+            brand: self.getAverageReviewsByTimePeriod(brand, period)
+            for brand in self.day_totals if brand is not None
+        }
+        return averages_by_brand, self.getAverageReviewsByTimePeriod(None, period)
+
+def streamReviewAggregates(items_path, reviews_path):
+    # The whole reviews file in one pass and constant memory, for dumps too
+    # big to convert to columns
+    reviews = ReviewStream(items_path, reviews_path)
+    aggregates = ReviewAggregates(reviews.brands)
+    date_parser = ReviewDateParser()
+    for brand, _, score, date_str in reviews:
+        aggregates.add(brand, score, date_parser.toDay(date_str))
+
+    aggregates.skipped_rows = reviews.skipped_rows
+    aggregates.malformed_dates = date_parser.malformed
+    return aggregates
+
+
+REVIEW_COLUMNS = {
+    'brand_id': np.int32,
+    'asin_id': np.int32,
+    'score': np.int8,
+    'day': np.int32,
+}
+
+class ReviewColumns:
+
+    # One row per review, stored column by column: brand and asin as ids into
+    # the name lists, the score as an int8 and the date as days since
+    # 1970-01-01 (MISSING_DAY when it couldn't be read). Every aggregation is
+    # a bincount over these arrays instead of a walk over nested dicts.
+    def __init__(self, brands, asins, brand_id, asin_id, score, day, skipped_rows=0, malformed_dates=0):
+        self.brands = list(brands)
+        self.asins = list(asins)
+        self.brand_id = brand_id
+        self.asin_id = asin_id
+        self.score = score
+        self.day = day
+        self.skipped_rows = skipped_rows
+        self.malformed_dates = malformed_dates
+        self.brand_index = {brand: i for i, brand in enumerate(self.brands)}
+
+    def __len__(self):
+        return len(self.score)
+
+    def getBrandCounts(self):
+        return np.bincount(self.brand_id, minlength=len(self.brands))
+
+    def getBrands(self):
+        # Brands in the same order as the items file, leaving out any without reviews
+        counts = self.getBrandCounts()
+        return [brand for brand, count in zip(self.brands, counts) if count > 0]
+
+    def getAverageScores(self):
+        counts = self.getBrandCounts()
+        totals = np.bincount(self.brand_id, weights=self.score, minlength=len(self.brands))
+        return {
+            brand: round(float(total / count), 3)
+            for brand, total, count in zip(self.brands, totals, counts)
+            if count > 0
+        }
 
-    
+    def getAverageScore(self, brand):
+        rows = self.brand_id == self.brand_index[brand]
+        return round(float(self.score[rows].mean()), 3)
+
+    def getAverageReviewsByTimePeriod(self, brand=None, period="month"):
+        rows = self.day != MISSING_DAY
+        if brand is not None:
+            rows &= self.brand_id == self.brand_index[brand]
+        labels, period_ids = getPeriodBuckets(self.day[rows], period)
+        totals = np.bincount(period_ids, weights=self.score[rows], minlength=len(labels))
+        counts = np.bincount(period_ids, minlength=len(labels))
+        return {
+            label: round(float(total / count), 3)
+            for label, total, count in zip(labels, totals, counts)
+        }
 
-            for review in review_csv_reader:
-                if review[0] not in condenced_review_dict.keys():
-                    short_review = [review[2], review[3]]
-                    condenced_review_dict[review[0]] = [short_review]
-                else:
-                    short_review = [review.copy()[2], review.copy()[3]]
-                    condenced_review_dict[review[0]].append(short_review)
-
-            to_json = {}
-            for item in item_csv_reader:
-                if item[1] not in to_json.keys():
-                    to_json[item[1]] = {item[0] : 'temp'}
-                else:
-                    to_json[item[1]][item[0]] = 'temp'
-            
-            items = condenced_review_dict.keys()
-            for brand in to_json:
-                for asin in to_json[brand]:
-                    for item in items:
-                        if asin == item:
-                            to_json[brand][asin] = condenced_review_dict[item]
-                       
-            with open(fr'{PROJECT_PATH}\formatted.json', 'w') as formmated_json:
-                json.dump(to_json, formmated_json, indent=4)
-          
\ No newline at end of file
+    def getAveragesByTimePeriod(self, period="month"):
+        # Every brand and the overall average from the same bincount: each row
+        # is bucketed once into brand_id * n_periods + period_id
+        rows = self.day != MISSING_DAY
+        labels, period_ids = getPeriodBuckets(self.day[rows], period)
+        n_periods = len(labels)
+        keys = self.brand_id[rows].astype(np.int64) * n_periods + period_ids
+        size = len(self.brands) * n_periods
+        scores = self.score[rows]
+        totals = np.bincount(keys, weights=scores, minlength=size).reshape(len(self.brands), n_periods)
+        counts = np.bincount(keys, minlength=size).reshape(len(self.brands), n_periods)
+
+        averages_by_brand = {}
+        for brand, brand_totals, brand_counts in zip(self.brands, totals, counts):
+            if brand_counts.sum() == 0:
+                continue
+            has_reviews = brand_counts > 0
+            averages_by_brand[brand] = {
+                label: round(float(total / count), 3)
+                for label, total, count in zip(labels[has_reviews], brand_totals[has_reviews], brand_counts[has_reviews])
+            }
+
+        overall_totals = totals.sum(0)
+        overall_counts = counts.sum(0)
+        overall_averages = {
+            label: round(float(total / count), 3)
+            for label, total, count in zip(labels, overall_totals, overall_counts)
+            if count > 0
+        }
+        return averages_by_brand, overall_averages
+
+
+def getPeriodBuckets(days, period="month"):
+    # days since 1970-01-01 -> (sorted period labels, index of each row's label)
+    days = np.asarray(days, dtype=np.int64)
+    if period == 'day':
+        keys = days
+    elif period == 'week':
+        # 1970-01-01 was a Thursday, so this rolls every day back to its Monday
+        keys = days - (days + 3) % 7
+    elif period in ('month', 'quarter'):
+        keys = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        if period == 'quarter':
+            keys = keys // 3
+    else:
+        raise ValueError(f"period must be one of {PERIODS}, not {period!r}")
+
+    unique_keys, period_ids = np.unique(keys, return_inverse=True)
+    if period in ('day', 'week'):
+        labels = [str(key) for key in unique_keys.astype('datetime64[D]')]
+    elif period == 'month':
+        labels = [str(key) for key in unique_keys.astype('datetime64[M]')]
+    else:
+        labels = [f"{1970 + key // 4}-Q{key % 4 + 1}" for key in unique_keys]
+    return np.array(labels, dtype=object), period_ids.reshape(-1)
+
+
+def getSourceSignature(*paths):
+    # Changes whenever one of the source files is rewritten
+    signature = []
+    for path in paths:
+        stat = os.stat(path)
+        signature.append([os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+    return signature
+
+DATE_BATCH_SIZE = 65536
+
+def convertReviewsToColumns(items_path, reviews_path, cache_dir):
+    # Same single pass join as streamReviewAggregates, but every row is kept
+    # as packed machine ints (10 bytes a review, not Python objects) since
+    # the columns are the row level data the cache is for
+    reviews = ReviewStream(items_path, reviews_path)
+    brands = reviews.brands
+    brand_index = {brand: i for i, brand in enumerate(brands)}
+    asin_index = {asin: i for i, asin in enumerate(reviews.asin_to_brand)}
+    date_parser = ReviewDateParser()
+
+    columns = {'brand_id': array('i'), 'asin_id': array('i'), 'score': array('b'), 'day': array('i')}
+    # Dates are converted a batch at a time through the vectorized toDays
+    date_batch = []
+    for brand, asin, score, date_str in reviews:
+        columns['brand_id'].append(brand_index[brand])
+        columns['asin_id'].append(asin_index[asin])
+        columns['score'].append(score)
+        date_batch.append(date_str)
+        if len(date_batch) == DATE_BATCH_SIZE:
+            columns['day'].frombytes(date_parser.toDays(date_batch).tobytes())
+            date_batch = []
+    if len(date_batch) > 0:
+        columns['day'].frombytes(date_parser.toDays(date_batch).tobytes())
+    skipped_rows = reviews.skipped_rows
+
+    # Everything is written into a temp dir and swapped in whole, so nothing
+    # reading the old cache ever sees a half written column
+    cache_dir = os.path.normpath(cache_dir)
+    temp_dir = f"{cache_dir}.{os.getpid()}.tmp"
+    os.makedirs(temp_dir, exist_ok=True)
+    for name, dtype in REVIEW_COLUMNS.items():
+        np.save(os.path.join(temp_dir, f"{name}.npy"), np.frombuffer(columns[name], dtype=dtype))
+
+    # Written last, so a half finished conversion never looks valid
+    meta = {
+        'source': getSourceSignature(items_path, reviews_path),
+        'brands': brands,
+        'asins': list(asin_index),
+        'skipped_rows': skipped_rows,
+        'malformed_dates': date_parser.malformed,
+    }
+    with open(os.path.join(temp_dir, 'meta.json'), 'w') as meta_json:
+        json.dump(meta, meta_json)
+
+    # os.replace can't overwrite a directory that has files in it, so the old one is moved aside first
+    old_dir = f"{cache_dir}.{os.getpid()}.old"
+    if os.path.exists(cache_dir):
+        os.replace(cache_dir, old_dir)
+    os.replace(temp_dir, cache_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+def loadReviewColumns(items_path, reviews_path, cache_dir):
+    meta_path = os.path.join(cache_dir, 'meta.json')
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r') as meta_json:
+            meta = json.load(meta_json)
+
+    if meta is None or meta['source'] != getSourceSignature(items_path, reviews_path):
+        convertReviewsToColumns(items_path, reviews_path, cache_dir)
+        with open(meta_path, 'r') as meta_json:
+            meta = json.load(meta_json)
+
+    loaded = {
+        name: np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode='r')
+        for name in REVIEW_COLUMNS
+    }
+    return ReviewColumns(
+        meta['brands'],
+        meta['asins'],
+        skipped_rows=meta['skipped_rows'],
+        malformed_dates=meta.get('malformed_dates', 0),
+        **loaded
+    )
+
+
+if __name__ == "__main__":
+    # python visualizing.py [--workers N] [--headless] [manimgl flags] renders
+    # Main one segment at a time (N of them at once), only re-rendering the
+    # segments whose code or inputs changed
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--headless", action="store_true")
+    args, render_flags = parser.parse_known_args()
+
+    # Build the column cache and compile the chart labels here once, so the
+    # workers only ever read them
+    reviews = loadReviewColumns(ITEMS_PATH, REVIEWS_PATH, REVIEW_CACHE_PATH)
+    cm.label_cache.warm(getChartLabels(reviews))
+
+    renderer = cm.SegmentRenderer(
+        __file__,
+        Main,
+        fr'{PROJECT_PATH}\segment_cache',
+        inputs=getSourceSignature(ITEMS_PATH, REVIEWS_PATH),
+        render_flags=render_flags,
+        workers=args.workers,
+        headless=args.headless
+    )
+    renderer.render(fr'{PROJECT_PATH}\Main.mp4')
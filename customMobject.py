@@ -1,16 +1,292 @@
 from __future__ import annotations
 from manimlib import *
 import numpy as np
+import itertools as it
 import json 
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import os
+import hashlib
+import pickle
+import time
+import inspect
+import subprocess
+import sys
+import shutil
+
+class LabelCache:
+
+    # Every chart asks for the same handful of strings ("0", "1", "2019-05",
+    # brand names...), so the TexText for each (text, scale) is only built once
+    # and every caller gets its own copy to move around.
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self.labels = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text, scale=1):
+        key = (str(text), scale)
+        if key in self.labels:
+            self.hits += 1
+            self.labels.move_to_end(key)
+        else:
+            self.misses += 1
+            self.labels[key] = TexText(str(text)).scale(scale)
+            if len(self.labels) > self.max_size:
+                self.labels.popitem(last=False)
+        return self.labels[key].copy()
+
+    def warm(self, texts, max_workers=None):
+        # Compiling a TexText goes through manim's on-disk svg cache, so
+        # building every label once in a pool of worker processes means the
+        # real construction in the scene only has to read the svgs back
+        cached_texts = {text for text, _ in self.labels}
+        texts = sorted({str(text) for text in texts} - cached_texts)
+        if len(texts) == 0:
+            return []
+        max_workers = max_workers or os.cpu_count() or 1
+        chunksize = max(1, len(texts) // (4 * max_workers))
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(compileLabel, texts, chunksize=chunksize))
+
+    def clear(self):
+        self.labels.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def getStats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.labels)}
+
+def compileLabel(text):
+    TexText(text)
+    return text
+
+label_cache = LabelCache()
+
+class ChartAxis(VGroup):
+
+    # The y axis (and optionally x axis) shared by the charts. All of the tick
+    # marks are subpaths of one VMobject instead of a Line each, and get()
+    # hands out copies of an already built axis for a range/size it has seen,
+    # so overlaid series don't each rebuild and re-position the same ticks.
+    cached_axes = {}
+
+    def __init__(self, y_range=[0, 5, 1], width=12, height=5, show_x_axis=True, **kwargs):
+        VGroup.__init__(self, **kwargs)
+        self.y_range = list(y_range)
+        self.width = width
+        self.height = height
+        y_min, y_max, y_step = y_range
+
+        axis_x = -width / 2 - 0.5
+        self.y_axis = Line(
+            start=np.array([axis_x, -height / 2, 0]),
+            end=np.array([axis_x, height / 2, 0]),
+            color=WHITE,
+            stroke_width=2
+        )
+        self.add(self.y_axis)
+
+        self.x_axis = None
+        if show_x_axis:
+            self.x_axis = Line(
+                start=np.array([axis_x, -height / 2, 0]),
+                end=np.array([width / 2, -height / 2, 0]),
+                color=WHITE,
+                stroke_width=2
+            )
+            self.add(self.x_axis)
+
+        num_ticks = int((y_max - y_min) / y_step) + 1
+        tick_values = [y_min + i * y_step for i in range(num_ticks)]
+        tick_ys = -height / 2 + (np.arange(num_ticks) * y_step / (y_max - y_min)) * height
+        tick_starts = np.stack([np.full(num_ticks, axis_x), tick_ys, np.zeros(num_ticks)], axis=1)
+        tick_ends = tick_starts + np.array([0.2, 0, 0])
+
+        self.y_ticks = self.get_tick_marks(tick_starts, tick_ends)
+        self.y_tick_labels = VGroup()
+        for tick_value, tick_start in zip(tick_values, tick_starts):
+            tick_label = label_cache.get(tick_value, 0.4)
+            tick_label.next_to(tick_start, LEFT, buff=0.1)
+            self.y_tick_labels.add(tick_label)
+
+        self.y_axis_labels = VGroup(self.y_ticks, self.y_tick_labels)
+        self.add(self.y_axis_labels)
+
+    @classmethod
+    def get(cls, y_range=[0, 5, 1], width=12, height=5, show_x_axis=True):
+        key = (tuple(y_range), width, height, show_x_axis)
+        if key not in cls.cached_axes:
+            cls.cached_axes[key] = cls(y_range, width, height, show_x_axis)
+        return cls.cached_axes[key].copy()
+
+    @staticmethod
+    def get_tick_marks(starts, ends, color=WHITE, stroke_width=2):
+        # Each tick is anchor, handle, anchor, and every tick after the first
+        # starts with a handle sitting on the previous end (a new subpath)
+        starts = np.asarray(starts, dtype=float).reshape(-1, 3)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 3)
+        ticks = VMobject(color=color, stroke_width=stroke_width)
+        if len(starts) == 0:
+            return ticks
+        points = np.stack([starts, 0.5 * (starts + ends), ends, ends], axis=1)
+        ticks.set_points(points.reshape(-1, 3)[:-1])
+        return ticks
+
+    @staticmethod
+    def get_time_labels(times, width=12, height=5):
+        # Merged x ticks plus a label on roughly every tenth time
+        num_points = len(times)
+        x_axis_labels = VGroup()
+        label_frequency = max(1, num_points // 10)
+        label_indices = range(0, num_points, label_frequency)
+        tick_xs = np.array([-width / 2 + (i / max(num_points - 1, 1)) * width for i in label_indices])
+        tick_starts = np.stack([tick_xs, np.full(len(tick_xs), -height / 2), np.zeros(len(tick_xs))], axis=1)
+        tick_ends = tick_starts + np.array([0, -0.2, 0])
+        x_axis_labels.add(ChartAxis.get_tick_marks(tick_starts, tick_ends))
+
+        for i, tick_end in zip(label_indices, tick_ends):
+            time_label = label_cache.get(times[i], 0.35)
+            time_label.next_to(tick_end, DOWN, buff=0.1)
+            time_label.rotate(-45 * DEGREES) 
+            x_axis_labels.add(time_label)
+        return x_axis_labels
+
+    def get_local_frame(self):
+        # Where the axis' construction time origin and unit right/up vectors
+        # are now, so a chart that was moved or scaled after being built can
+        # keep placing new things in the coordinates it was laid out in
+        start, end = self.y_axis.get_start(), self.y_axis.get_end()
+        up = (end - start) / self.height
+        right = np.cross(up, OUT)
+        origin = start + (self.width / 2 + 0.5) * right + (self.height / 2) * up
+        return origin, right, up
+
+    def local_to_scene(self, points):
+        origin, right, up = self.get_local_frame()
+        points = np.asarray(points, dtype=float)
+        return origin + points[..., 0:1] * right + points[..., 1:2] * up
+
+    def value_to_y(self, values):
+        y_min, y_max, _ = self.y_range
+        values = np.asarray(values, dtype=float)
+        if (y_max - y_min) == 0:
+            return np.full(values.shape, -self.height / 2)
+        return -self.height / 2 + (values - y_min) / (y_max - y_min) * self.height
+
+class BarSet(VMobject):
+
+    # Every bar of a BarGraph drawn as one closed subpath of a single VMobject.
+    # A rectangle is 5 anchors + 4 handles, and each bar after the first needs
+    # one extra handle sitting on the last anchor to start a new subpath, so
+    # bar i owns points [10 * i, 10 * i + 10).
+    points_per_bar = 10
+
+    def __init__(self, centers, heights, bar_width, colors, fill_opacity=0.8, stroke_color=WHITE, stroke_width=2, **kwargs):
+        VMobject.__init__(
+            self,
+            fill_opacity=fill_opacity,
+            stroke_color=stroke_color,
+            stroke_width=stroke_width,
+            **kwargs
+        )
+        self.bar_width = bar_width
+        self.num_bars = len(heights)
+        if self.num_bars == 0:
+            return
+        self.set_points(self.get_bar_points(centers, heights, bar_width))
+        self.set_bar_colors(colors, fill_opacity)
+
+    @staticmethod
+    def get_bar_points(centers, heights, bar_width):
+        # bar_width can be one width for every bar or one per bar
+        centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+        heights = np.asarray(heights, dtype=float)
+        half_width = np.broadcast_to(np.asarray(bar_width, dtype=float), heights.shape) / 2
+        half_height = heights / 2
+
+        # Counter-clockwise from the bottom left corner, back to the start
+        corner_signs = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1], [-1, -1]])
+        anchors = np.zeros((len(heights), 5, 3))
+        anchors[:, :, 0] = centers[:, [0]] + corner_signs[:, 0] * half_width[:, np.newaxis]
+        anchors[:, :, 1] = centers[:, [1]] + corner_signs[:, 1] * half_height[:, np.newaxis]
+        anchors[:, :, 2] = centers[:, [2]]
+
+        points = np.zeros((len(heights), BarSet.points_per_bar, 3))
+        points[:, 0:9:2] = anchors
+        points[:, 1:9:2] = 0.5 * (anchors[:, :-1] + anchors[:, 1:])
+        points[:, 9] = anchors[:, -1]
+        return points.reshape(-1, 3)[:-1]
+
+    def get_bar_slice(self, index):
+        start = index * self.points_per_bar
+        return slice(start, min(start + self.points_per_bar, self.get_num_points()))
+
+    def get_bar_corners(self, index):
+        return self.get_points()[self.get_bar_slice(index)][0:8:2]
+
+    def get_bar_center(self, index):
+        return self.get_bar_corners(index).mean(0)
+
+    def get_bar_bottom(self, index):
+        corners = self.get_bar_corners(index)
+        return np.array([corners[:, 0].mean(), corners[:, 1].min(), corners[:, 2].mean()])
+
+    def get_bar_top(self, index):
+        corners = self.get_bar_corners(index)
+        return np.array([corners[:, 0].mean(), corners[:, 1].max(), corners[:, 2].mean()])
+
+    def set_bar_heights(self, heights):
+        # Keep every bar's bottom edge and width where they are now (so this
+        # still works after the bars were scaled) and rebuild all the
+        # rectangles in one go
+        points = self.get_points()
+        padded = np.vstack([points, points[-1:]]).reshape(self.num_bars, self.points_per_bar, 3)
+        anchors = padded[:, 0:8:2]
+        heights = np.asarray(heights, dtype=float)
+        widths = anchors[:, :, 0].max(1) - anchors[:, :, 0].min(1)
+        centers = anchors.mean(1)
+        centers[:, 1] = anchors[:, :, 1].min(1) + heights / 2
+        self.set_points(self.get_bar_points(centers, heights, widths))
+        return self
+
+    def shift_bar(self, index, vector):
+        points = self.get_points().copy()
+        points[self.get_bar_slice(index)] += vector
+        self.set_points(points)
+        return self
+
+    def move_bar_to(self, index, point):
+        return self.shift_bar(index, np.asarray(point) - self.get_bar_center(index))
+
+    @Mobject.affects_data
+    def set_bar_colors(self, colors, opacity=None):
+        for i, color in enumerate(colors[:self.num_bars]):
+            bar_slice = self.get_bar_slice(i)
+            self.data['fill_rgba'][bar_slice, :3] = color_to_rgb(color)
+            if opacity is not None:
+                self.data['fill_rgba'][bar_slice, 3] = opacity
+        return self
+
+    def set_bar_color(self, index, color, opacity=None):
+        colors = [self.get_bar_color(i) for i in range(self.num_bars)]
+        colors[index] = color
+        return self.set_bar_colors(colors, opacity)
+
+    def get_bar_color(self, index):
+        return rgb_to_color(self.data['fill_rgba'][index * self.points_per_bar, :3])
 
 class BarGraph(VGroup):
 
-    def __init__(self, values, bar_names=None, y_range=[0, 1, 1], width=12, height=5, bar_colors=None, **kwargs):
+    def __init__(self, values, bar_names=None, y_range=[0, 1, 1], width=12, height=5, bar_colors=None, batched=False, **kwargs):
         VGroup.__init__(self, **kwargs)
         self.values = list(values)
         self.bar_names = list(bar_names) if bar_names is not None else [str(i) for i in range(len(values))]
         self.bar_colors = bar_colors
-        y_min, y_max, y_step = y_range
+        self.batched = batched
+        self.y_range = y_range
+        self.height = height
 
         if len(self.values) == 0:
             return
@@ -18,6 +294,7 @@ class BarGraph(VGroup):
         total_width = width
         bar_slot = total_width / len(self.values)
         bar_width = bar_slot * 0.6
+        self.bar_width = bar_width
 
         default_colors = [BLUE, RED, GREEN, YELLOW, PURPLE, ORANGE, TEAL, MAROON, PINK, GOLD]
 
@@ -25,71 +302,155 @@ class BarGraph(VGroup):
         labels = VGroup()
         value_labels = VGroup()
 
-        y_axis = Line(
-            start=np.array([-total_width / 2 - 0.5, -height / 2, 0]),
-            end=np.array([-total_width / 2 - 0.5, height / 2, 0]),
-            color=WHITE,
-            stroke_width=2
-        )
-
-        y_axis_labels = VGroup()
-        num_ticks = int((y_max - y_min) / y_step) + 1
-
-        for i in range(num_ticks):
-            tick_value = y_min + i * y_step
-            tick_y = -height / 2 + (i * y_step / (y_max - y_min)) * height
-
-            tick = Line(
-                start=np.array([-total_width / 2 - 0.5, tick_y, 0]),
-                end=np.array([-total_width / 2 - 0.3, tick_y, 0]),
-                color=WHITE,
-                stroke_width=2
-            )
-            y_axis_labels.add(tick)
+        axis = ChartAxis.get(y_range, width, height, show_x_axis=False)
 
-            # Tick label
-            tick_label = TexText(str(tick_value)).scale(0.4)
-            tick_label.next_to(tick, LEFT, buff=0.1)
-            y_axis_labels.add(tick_label)
+        bar_x_positions = []
+        bar_heights = []
+        colors = []
 
         for i, val in enumerate(self.values):
 
-            height_scaled = 0
-            if (y_max - y_min) != 0:
-                height_scaled = (val - y_min) / (y_max - y_min) * height
+            height_scaled = self.get_bar_height(val)
 
             if self.bar_colors and i < len(self.bar_colors):
                 color = self.bar_colors[i]
             else:
                 color = default_colors[i % len(default_colors)]
 
-            bar = Rectangle(width=bar_width, height=height_scaled, fill_color=color, fill_opacity=0.8, stroke_width=2, stroke_color=WHITE)
             x = (-total_width / 2) + (bar_slot * i) + (bar_slot / 2)
-            bar.move_to(np.array([x, -height / 2 + height_scaled / 2, 0]))
-            bars.add(bar)
+            bar_x_positions.append(x)
+            bar_heights.append(height_scaled)
+            colors.append(color)
 
-            name = TexText(str(self.bar_names[i])).scale(0.5)
-            name.next_to(bar, DOWN, buff=0.1)
+            if not batched:
+                bar = Rectangle(width=bar_width, height=height_scaled, fill_color=color, fill_opacity=0.8, stroke_width=2, stroke_color=WHITE)
+                bar.move_to(np.array([x, -height / 2 + height_scaled / 2, 0]))
+                bars.add(bar)
+
+            name = label_cache.get(self.bar_names[i], 0.5)
+            name.next_to(np.array([x, -height / 2, 0]), DOWN, buff=0.1)
             labels.add(name)
 
-            if isinstance(val, float):
-                val_str = f"{val:.3f}"  
-            else:
-                val_str = str(val)
-            vlabel = TexText(val_str).scale(0.5)
-            vlabel.next_to(bar, UP, buff=0.15)
+            vlabel = self.get_value_label(val)
+            vlabel.next_to(np.array([x, -height / 2 + height_scaled, 0]), UP, buff=0.15)
             value_labels.add(vlabel)
 
+        if batched:
+            centers = [[x, -height / 2 + h / 2, 0] for x, h in zip(bar_x_positions, bar_heights)]
+            bars = BarSet(centers, bar_heights, bar_width, colors)
+
+        self.bar_x_positions = np.array(bar_x_positions)
         self.bars = bars
         self.labels = labels
         self.value_labels = value_labels
-        self.y_axis = y_axis
-        self.y_axis_labels = y_axis_labels
-        self.add(bars, labels, value_labels, y_axis, y_axis_labels)
+        self.axis = axis
+        self.y_axis = axis.y_axis
+        self.y_axis_labels = axis.y_axis_labels
+        self.add(bars, labels, value_labels, axis)
 
     def get_bar_labels(self):
         return self.value_labels
+
+    def get_bar_height(self, val):
+        y_min, y_max, _ = self.y_range
+        if (y_max - y_min) == 0:
+            return 0
+        return (val - y_min) / (y_max - y_min) * self.height
+
+    def get_value_label(self, val):
+        # Numbers get a DecimalNumber, so set_values can just change its value
+        if isinstance(val, (int, float, np.number)):
+            num_decimal_places = 3 if isinstance(val, (float, np.floating)) else 0
+            return DecimalNumber(val, num_decimal_places=num_decimal_places).scale(0.5)
+        return label_cache.get(val, 0.5)
+
+    def set_values(self, values):
+        # Resize every bar and update its value label in place, keeping each
+        # bar wherever it currently is (so this also works after a reorder).
+        # Heights are scaled by however much the axis has been since the chart
+        # was built. Use chart.animate.set_values(...) to animate the change.
+        self.commit_values(values)
+        _, _, up = self.axis.get_local_frame()
+        scale = np.linalg.norm(up)
+        heights = [self.get_bar_height(val) * scale for val in self.values]
+        baseline = self.y_axis.get_start()[1]
+
+        if self.batched:
+            self.bars.set_bar_heights(heights)
+        else:
+            for bar, bar_height in zip(self.bars, heights):
+                center = bar.get_bottom() + UP * bar_height / 2
+                bar.set_points(BarSet.get_bar_points([center], [bar_height], bar.get_width()))
+
+        for i, (val, bar_height) in enumerate(zip(self.values, heights)):
+            vlabel = self.value_labels[i]
+            if isinstance(vlabel, DecimalNumber):
+                vlabel.set_value(val)
+            else:
+                vlabel.become(self.get_value_label(val))
+            top = np.array([self.get_bar_x(i), baseline + bar_height, 0])
+            vlabel.next_to(top, UP, buff=0.15)
+        return self
+
+    @override_animate(set_values)
+    def _set_values_animation(self, values):
+        return BarValuesTransform(self, values)
+
+    def commit_values(self, values):
+        # The numbers behind the chart, as opposed to the points drawing it
+        self.values = list(values)
+        for vlabel, val in zip(self.value_labels, self.values):
+            if isinstance(vlabel, DecimalNumber):
+                vlabel.number = val
+        return self
+
+    def get_resort_animations(self, descending=True):
+        # Slide the bars into order of their current values (stable on ties)
+        values = np.array(self.values, dtype=float)
+        order = np.argsort(-values if descending else values, kind='stable')
+        return self.get_reorder_animations(order)
+
+    def get_bar_x(self, index):
+        if self.batched:
+            return self.bars.get_bar_center(index)[0]
+        return self.bars[index].get_x()
+
+    def get_slot_x(self, slot):
+        # bar_x_positions are where the slots were when the chart was built,
+        # so go through the axis to find where they are now
+        return self.axis.local_to_scene([self.bar_x_positions[slot], 0])[0]
+
+    def get_reorder_animations(self, order):
+        # order[k] is the index of the bar that should end up in slot k
+        animations = []
+        target_bars = self.bars.copy() if self.batched else None
+
+        for slot, index in enumerate(order):
+            shift = RIGHT * (self.get_slot_x(slot) - self.get_bar_x(index))
+            if self.batched:
+                target_bars.shift_bar(index, shift)
+            else:
+                animations.append(self.bars[index].animate.shift(shift))
+            animations.append(self.labels[index].animate.shift(shift))
+            animations.append(self.value_labels[index].animate.shift(shift))
+
+        if self.batched:
+            animations.insert(0, Transform(self.bars, target_bars))
+        return animations
     
+class BarValuesTransform(Transform):
+
+    # What chart.animate.set_values(...) plays. .animate only ever changes a
+    # copy of the chart and Transform only moves point data, so the new values
+    # get written onto the real chart once the animation is done.
+    def __init__(self, chart, values, **kwargs):
+        self.values = list(values)
+        super().__init__(chart, chart.copy().set_values(self.values), **kwargs)
+
+    def finish(self):
+        super().finish()
+        self.mobject.commit_values(self.values)
+
 class Key(VGroup):
     def __init__(self, brands, brand_colors, **kwargs):
         VGroup.__init__(self, **kwargs)
@@ -103,7 +464,7 @@ class Key(VGroup):
 
             color_box = Square(side_length=color_box_size, fill_color=color, fill_opacity=0.8, stroke_color=WHITE, stroke_width=2)
  
-            name = TexText(brand).scale(0.4)
+            name = label_cache.get(brand, 0.4)
             name.next_to(color_box, RIGHT, buff=0.2)
 
             row = VGroup(color_box, name)
@@ -121,11 +482,17 @@ class Key(VGroup):
 
 class LineChart(VGroup):
 
-    def __init__(self, times, values, y_range=[0, 5, 1], width=12, height=5, line_color=BLUE, show_axes=True, **kwargs):
+    def __init__(self, times, values, y_range=[0, 5, 1], width=12, height=5, line_color=BLUE, show_axes=True, downsample=None, max_points=None, markers="dots", marker_radius=0.06, axis=None, **kwargs):
         VGroup.__init__(self, **kwargs)
+        # A chart given someone else's axis lays itself out on it, but
+        # leaves adding the axis to the scene to its owner
+        owns_axis = axis is None
+        if axis is not None:
+            y_range, width, height = axis.y_range, axis.width, axis.height
         self.times = list(times)
         self.values = list(values)
         self.line_color = line_color
+        self.downsample = downsample
         y_min, y_max, y_step = y_range
 
         if len(self.values) == 0:
@@ -135,79 +502,51 @@ class LineChart(VGroup):
         num_points = len(self.values)
 
         if show_axes == True:
-            
-            y_axis = Line(
-                start=np.array([-total_width / 2 - 0.5, -height / 2, 0]),
-                end=np.array([-total_width / 2 - 0.5, height / 2, 0]),
-                color=WHITE,
-                stroke_width=2
-            )
+            if axis is None:
+                axis = ChartAxis.get(y_range, width, height)
 
-            x_axis = Line(
-                start=np.array([-total_width / 2 - 0.5, -height / 2, 0]),
-                end=np.array([total_width / 2, -height / 2, 0]),
-                color=WHITE,
-                stroke_width=2
-            )
-
-            y_axis_labels = VGroup()
-            num_ticks = int((y_max - y_min) / y_step) + 1
-
-            for i in range(num_ticks):
-                tick_value = y_min + i * y_step
-                tick_y = -height / 2 + (i * y_step / (y_max - y_min)) * height
-
-                tick = Line(
-                    start=np.array([-total_width / 2 - 0.5, tick_y, 0]),
-                    end=np.array([-total_width / 2 - 0.3, tick_y, 0]),
-                    color=WHITE,
-                    stroke_width=2
-                )
-                y_axis_labels.add(tick)
-
-                tick_label = TexText(str(tick_value)).scale(0.4)
-                tick_label.next_to(tick, LEFT, buff=0.1)
-                y_axis_labels.add(tick_label)
-
-            x_axis_labels = VGroup()
-            label_frequency = max(1, num_points // 10)
-
-            for i in range(0, num_points, label_frequency):
-                x_pos = -total_width / 2 + (i / (num_points - 1)) * total_width
-                tick = Line(
-                    start=np.array([x_pos, -height / 2, 0]),
-                    end=np.array([x_pos, -height / 2 - 0.2, 0]),
-                    color=WHITE,
-                    stroke_width=2
-                )
-                x_axis_labels.add(tick)
-
-                time_label = TexText(self.times[i]).scale(0.35)
-                time_label.next_to(tick, DOWN, buff=0.1)
-                time_label.rotate(-45 * DEGREES) 
-                x_axis_labels.add(time_label)
-            self.y_axis = y_axis
-            self.x_axis = x_axis
-            self.y_axis_labels = y_axis_labels
+            x_axis_labels = ChartAxis.get_time_labels(self.times, total_width, height)
             self.x_axis_labels = x_axis_labels
 
-        points = []
-        dots = VGroup()
-
-        for i, val in enumerate(self.values):
-
-            x_pos = -total_width / 2 + (i / (num_points - 1)) * total_width
-            height_scaled = 0
-
-            if (y_max - y_min) != 0:
-                height_scaled = (val - y_min) / (y_max - y_min) * height
-            y_pos = -height / 2 + height_scaled
-
-            point = np.array([x_pos, y_pos, 0])
-            points.append(point)
-
-            dot = Dot(point, color=self.line_color, radius=0.06)
-            dots.add(dot)
+        self.axis = axis
+        if axis is not None:
+            self.y_axis = axis.y_axis
+            self.x_axis = axis.x_axis
+            self.y_axis_labels = axis.y_axis_labels
+
+        # Every sample keeps its position in raw_points, but the line and dots
+        # only get as many points as the chart has pixel columns to show them
+        x_positions = -total_width / 2 + (np.arange(num_points) / max(num_points - 1, 1)) * total_width
+        heights_scaled = np.zeros(num_points)
+        if (y_max - y_min) != 0:
+            heights_scaled = (np.array(self.values, dtype=float) - y_min) / (y_max - y_min) * height
+        y_positions = -height / 2 + heights_scaled
+        self.raw_points = np.stack([x_positions, y_positions, np.zeros(num_points)], axis=1)
+
+        if max_points is None:
+            max_points = max(3, int(total_width / FRAME_WIDTH * DEFAULT_PIXEL_WIDTH))
+        if downsample == "lttb":
+            self.sample_indices = self.lttb_indices(x_positions, y_positions, max_points)
+        elif downsample == "minmax":
+            self.sample_indices = self.min_max_indices(x_positions, y_positions, max_points // 2)
+        elif downsample is None:
+            self.sample_indices = np.arange(num_points)
+        else:
+            raise ValueError(f"downsample must be None, 'lttb' or 'minmax', not {downsample!r}")
+
+        points = self.raw_points[self.sample_indices]
+
+        if markers == "cloud":
+            # All markers in one point cloud: a single position array plus
+            # per-point radius and rgba, instead of one Dot mobject per sample
+            dots = DotCloud(points, color=self.line_color, radius=marker_radius)
+        elif markers == "dots":
+            dots = VGroup()
+            for point in points:
+                dot = Dot(point, color=self.line_color, radius=marker_radius)
+                dots.add(dot)
+        else:
+            raise ValueError(f"markers must be 'dots' or 'cloud', not {markers!r}")
 
         if len(points) > 1:
             line = VMobject(color=self.line_color, stroke_width=3)
@@ -219,10 +558,777 @@ class LineChart(VGroup):
         self.dots = dots
         
         if show_axes == True:
-            self.add(y_axis, x_axis, y_axis_labels, x_axis_labels, line)
+            if owns_axis:
+                self.add(axis)
+            self.add(x_axis_labels, line)
         else:
             self.add(line)
 
+    @staticmethod
+    def lttb_indices(xs, ys, n_out):
+        # Largest triangle three buckets: keep the first and last sample, then
+        # from each of the n_out - 2 buckets in between keep the sample making
+        # the biggest triangle with the last kept one and the next bucket's mean
+        n = len(xs)
+        if n_out >= n or n_out < 3:
+            return np.arange(n)
+
+        bucket_edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+        indices = np.zeros(n_out, dtype=int)
+        indices[-1] = n - 1
+        previous = 0
+
+        for b in range(n_out - 2):
+            start, end = bucket_edges[b], bucket_edges[b + 1]
+            next_start, next_end = end, bucket_edges[b + 2] if b + 2 < len(bucket_edges) else n
+            next_x = xs[next_start:next_end].mean()
+            next_y = ys[next_start:next_end].mean()
+
+            areas = np.abs(
+                (xs[previous] - next_x) * (ys[start:end] - ys[previous]) -
+                (xs[previous] - xs[start:end]) * (next_y - ys[previous])
+            )
+            previous = start + int(np.argmax(areas))
+            indices[b + 1] = previous
+
+        return indices
+
+    @staticmethod
+    def min_max_indices(xs, ys, n_columns):
+        # Keep the lowest and highest sample that lands in each pixel column,
+        # plus both ends, so no spike disappears from the drawn line
+        n = len(xs)
+        if 2 * n_columns >= n or n_columns < 1:
+            return np.arange(n)
+
+        x_span = (xs[-1] - xs[0]) or 1
+        columns = np.minimum(((xs - xs[0]) / x_span * n_columns).astype(int), n_columns - 1)
+        order = np.lexsort((ys, columns))
+        _, starts = np.unique(columns[order], return_index=True)
+        ends = np.append(starts[1:], n) - 1
+
+        return np.unique(np.concatenate([[0, n - 1], order[starts], order[ends]]))
+
+    def get_nearest_index(self, x_pos):
+        # Index into the full times/values for a position on the chart
+        return int(np.argmin(np.abs(self.raw_points[:, 0] - x_pos)))
+
+    def get_raw_point(self, index):
+        return self.raw_points[index]
+
+class StreamingLineChart(VGroup):
+
+    # A LineChart for live data: it shows the last window_size samples, and
+    # append() only touches the newest point and the edge tick labels.
+    # Every sample has a fixed x slot, so once the window is full the line's
+    # points just have their y values slid one slot to the left in place.
+    def __init__(self, window_size=100, y_range=[0, 5, 1], width=12, height=5, line_color=BLUE, show_axes=True, label_frequency=10, **kwargs):
+        VGroup.__init__(self, **kwargs)
+        # The line needs at least two anchors for append() to slide it along
+        if window_size < 2:
+            raise ValueError(f"window_size must be at least 2, not {window_size}")
+        self.window_size = window_size
+        self.y_range = y_range
+        self.width = width
+        self.height = height
+        self.label_frequency = label_frequency
+        self.line_color = line_color
+
+        # Ring buffer of the samples in the window, oldest at self.start
+        self.window_times = [None] * window_size
+        self.window_values = np.zeros(window_size)
+        self.start = 0
+        self.count = 0
+        self.total_samples = 0
+
+        self.x_step = width / (window_size - 1)
+        self.x_positions = -width / 2 + np.arange(window_size) * self.x_step
+
+        self.axis = ChartAxis.get(y_range, width, height)
+        self.y_axis = self.axis.y_axis
+        self.x_axis = self.axis.x_axis
+        self.y_axis_labels = self.axis.y_axis_labels
+
+        # (sample number, tick, label) for every x label still on screen
+        self.x_axis_labels = VGroup()
+        self.x_label_entries = deque()
+
+        self.line = VMobject(color=line_color, stroke_width=3)
+
+        # New samples are placed relative to wherever the axis is now, so the
+        # axis always comes along (just invisible without show_axes)
+        if show_axes == True:
+            self.add(self.axis, self.x_axis_labels, self.line)
+        else:
+            self.axis.set_opacity(0)
+            self.add(self.axis, self.line)
+
+    def get_y(self, value):
+        y_min, y_max, _ = self.y_range
+        if (y_max - y_min) == 0:
+            return -self.height / 2
+        return -self.height / 2 + (value - y_min) / (y_max - y_min) * self.height
+
+    def append(self, time, value):
+        y_pos = self.get_y(value)
+        _, right, _ = self.axis.get_local_frame()
+
+        if self.count < self.window_size:
+            slot = self.count
+            self.window_times[slot] = time
+            self.window_values[slot] = value
+            self.count += 1
+
+            point = self.axis.local_to_scene([self.x_positions[slot], y_pos])
+            if slot == 0:
+                self.line.set_points([point])
+            else:
+                self.line.add_line_to(point)
+        else:
+            self.window_times[self.start] = time
+            self.window_values[self.start] = value
+            self.start = (self.start + 1) % self.window_size
+
+            # Anchors are at even indices and handles at odd ones, so moving
+            # every point two entries down (and one slot back) slides the
+            # whole line one slot left
+            points = self.line.get_points()
+            points[:-2] = points[2:] - self.x_step * right
+            points[-1] = self.axis.local_to_scene([self.x_positions[-1], y_pos])
+            points[-2] = 0.5 * (points[-3] + points[-1])
+            self.line.refresh_bounding_box()
+            self.line.refresh_joint_angles()
+            self.line.note_changed_data()
+
+            self.x_axis_labels.shift(-self.x_step * right)
+            self.retire_x_labels()
+
+        if self.total_samples % self.label_frequency == 0:
+            self.add_x_label(time, self.x_positions[self.count - 1])
+        self.total_samples += 1
+        return self
+
+    def extend(self, times, values):
+        for time, value in zip(times, values):
+            self.append(time, value)
+        return self
+
+    def add_x_label(self, time, x_pos):
+        # x_pos is in the chart's construction time coordinates
+        tick = Line(
+            start=self.axis.local_to_scene([x_pos, -self.height / 2]),
+            end=self.axis.local_to_scene([x_pos, -self.height / 2 - 0.2]),
+            color=WHITE,
+            stroke_width=2
+        )
+        _, right, _ = self.axis.get_local_frame()
+        time_label = label_cache.get(time, 0.35)
+        time_label.scale(np.linalg.norm(right))
+        time_label.next_to(tick, DOWN, buff=0.1)
+        time_label.rotate(-45 * DEGREES)
+        self.x_axis_labels.add(tick, time_label)
+        self.x_label_entries.append((self.total_samples, tick, time_label))
+
+    def retire_x_labels(self):
+        # Sample number of the oldest sample still in the window
+        oldest = self.total_samples + 1 - self.window_size
+        while self.x_label_entries and self.x_label_entries[0][0] < oldest:
+            _, tick, time_label = self.x_label_entries.popleft()
+            self.x_axis_labels.remove(tick, time_label)
+
+    def get_series(self):
+        # The window's samples, oldest first
+        order = (self.start + np.arange(self.count)) % self.window_size
+        return [self.window_times[i] for i in order], self.window_values[order]
+
+class SeriesLines(VMobject):
+
+    # Every series of a MultiLineChart as one subpath of a single VMobject.
+    # base_points holds the un-offset positions and point_series says which
+    # series each point belongs to, so moving whole series around is one
+    # vectorized add: base_points + offsets[point_series].
+    def __init__(self, series_points, colors, stroke_width=3, **kwargs):
+        VMobject.__init__(self, stroke_width=stroke_width, **kwargs)
+        self.num_series = len(series_points)
+        self.offsets = np.zeros((self.num_series, 3))
+        self.series_slices = []
+
+        chunks = []
+        point_series = []
+        num_points = 0
+        for i, anchors in enumerate(series_points):
+            if len(anchors) < 2:
+                self.series_slices.append(slice(num_points, num_points))
+                continue
+            path = np.zeros((2 * len(anchors) - 1, 3))
+            path[0::2] = anchors
+            path[1::2] = 0.5 * (anchors[:-1] + anchors[1:])
+            if chunks:
+                # A handle on top of the previous end starts a new subpath
+                chunks.append(chunks[-1][-1:])
+                point_series.append(point_series[-1])
+                num_points += 1
+            chunks.append(path)
+            point_series.extend([i] * len(path))
+            self.series_slices.append(slice(num_points, num_points + len(path)))
+            num_points += len(path)
+
+        self.point_series = np.array(point_series, dtype=int)
+        self.base_points = np.vstack(chunks) if chunks else np.zeros((0, 3))
+        if len(self.base_points) > 0:
+            self.set_points(self.base_points)
+            self.set_series_colors(colors)
+
+    def set_series_offsets(self, offsets):
+        self.offsets = np.array(offsets, dtype=float).reshape(self.num_series, 3)
+        if len(self.base_points) > 0:
+            self.set_points(self.base_points + self.offsets[self.point_series])
+        return self
+
+    @override_animate(set_series_offsets)
+    def _set_series_offsets_animation(self, offsets):
+        return SeriesOffsetsTransform(self, offsets)
+
+    @Mobject.affects_data
+    def set_series_colors(self, colors):
+        for series_slice, color in zip(self.series_slices, colors):
+            self.data['stroke_rgba'][series_slice, :3] = color_to_rgb(color)
+        return self
+
+    def get_series_line(self, index):
+        # A standalone copy of one series, for animating it on its own
+        series_slice = self.series_slices[index]
+        line = VMobject(stroke_width=self.get_stroke_width())
+        if series_slice.stop > series_slice.start:
+            line.set_points(self.get_points()[series_slice])
+            line.set_stroke(rgb_to_color(self.data['stroke_rgba'][series_slice.start, :3]))
+        return line
+
+class SeriesOffsetsTransform(Transform):
+
+    # What lines.animate.set_series_offsets(...) plays, writing the offsets
+    # onto the real lines once it's done (see BarValuesTransform)
+    def __init__(self, lines, offsets, **kwargs):
+        self.offsets = np.array(offsets, dtype=float).reshape(lines.num_series, 3)
+        super().__init__(lines, lines.copy().set_series_offsets(self.offsets), **kwargs)
+
+    def finish(self):
+        super().finish()
+        self.mobject.offsets = self.offsets
+
+class MultiLineChart(VGroup):
+
+    # Several series over the same times, values shaped (series, times) with
+    # NaN where a series has no sample. Every series shares the one axis and
+    # lives in the same SeriesLines buffer.
+    def __init__(self, times, values, y_range=[0, 5, 1], width=12, height=5, line_colors=None, series_names=None, show_axes=True, stroke_width=3, **kwargs):
+        VGroup.__init__(self, **kwargs)
+        self.times = list(times)
+        self.values = np.array(values, dtype=float).reshape(-1, len(self.times))
+        num_series, num_points = self.values.shape
+        self.series_names = list(series_names) if series_names is not None else [str(i) for i in range(num_series)]
+
+        default_colors = [BLUE, RED, GREEN, YELLOW, PURPLE, ORANGE, TEAL, MAROON, PINK, GOLD]
+        if line_colors is None:
+            line_colors = [default_colors[i % len(default_colors)] for i in range(num_series)]
+        self.line_colors = list(line_colors)
+
+        self.axis = ChartAxis.get(y_range, width, height)
+        self.y_axis = self.axis.y_axis
+        self.x_axis = self.axis.x_axis
+        self.y_axis_labels = self.axis.y_axis_labels
+        self.x_axis_labels = ChartAxis.get_time_labels(self.times, width, height)
+
+        x_positions = -width / 2 + (np.arange(num_points) / max(num_points - 1, 1)) * width
+        self.series_points = np.zeros((num_series, num_points, 3))
+        self.series_points[:, :, 0] = x_positions
+        self.series_points[:, :, 1] = self.axis.value_to_y(self.values)
+        self.valid = ~np.isnan(self.values)
+
+        self.lines = SeriesLines(
+            [points[valid] for points, valid in zip(self.series_points, self.valid)],
+            self.line_colors,
+            stroke_width=stroke_width,
+        )
+
+        if show_axes == True:
+            self.add(self.axis, self.x_axis_labels, self.lines)
+        else:
+            self.add(self.lines)
+
+    def get_series_index(self, name):
+        return self.series_names.index(name)
+
+    def get_series_line(self, name_or_index):
+        if isinstance(name_or_index, str):
+            name_or_index = self.get_series_index(name_or_index)
+        return self.lines.get_series_line(name_or_index)
+
+    def get_depth_offsets(self, depth_spacing=0.5):
+        # Spread the series evenly along OUT, centered on the chart
+        num_series = len(self.series_names)
+        depths = np.arange(num_series) * depth_spacing - (num_series - 1) * depth_spacing / 2
+        return depths[:, np.newaxis] * OUT
+
+class MobjectSnapshot:
+
+    # Remembers a mobject family by its numeric state only: each member's
+    # data array (points, colors...), uniforms and submobject list, instead of
+    # deep copying every mobject. This is not copy-on-write. The first
+    # snapshot of a family still copies every member's data array, and those
+    # are most of what .copy() would have duplicated, so the saving is only
+    # the per-mobject overhead (no new Mobject objects, shader wrappers or
+    # updaters). Arrays are only shared when the same family is snapshotted
+    # again with previous= and a member hasn't changed since. restore()
+    # happens all at once, writing back only the members that changed.
+    def __init__(self, mobject, previous=None):
+        self.mobject = mobject
+        self.family = mobject.get_family()
+
+        previous_data = {}
+        if previous is not None:
+            previous_data = {id(mob): data for mob, data in zip(previous.family, previous.data)}
+
+        self.data = []
+        self.uniforms = []
+        self.submobjects = []
+        for mob in self.family:
+            data = previous_data.get(id(mob))
+            if data is None or not self.is_same_data(data, mob.data):
+                data = mob.data.copy()
+                data.flags.writeable = False
+            self.data.append(data)
+            self.uniforms.append({
+                key: value.copy() if isinstance(value, np.ndarray) else value
+                for key, value in mob.uniforms.items()
+            })
+            self.submobjects.append(list(mob.submobjects))
+
+    @staticmethod
+    def is_same_data(data_1, data_2):
+        return data_1.shape == data_2.shape and bool((data_1 == data_2).all())
+
+    def restore(self):
+        for mob, data, uniforms, submobjects in zip(self.family, self.data, self.uniforms, self.submobjects):
+            if mob.submobjects != submobjects:
+                mob.set_submobjects(submobjects)
+            if not self.is_same_data(data, mob.data):
+                mob.set_data(data)
+            mob.uniforms.update(uniforms)
+        return self.mobject
+
+class ChartCache:
+
+    # Built charts pickled to disk (manim's own Mobject.serialize), keyed on
+    # a hash of the chart class, its arguments, the input data and this
+    # file's source, so a re-render with unchanged data skips construction.
+    # Entries older than max_age or past max_size (oldest use first) are
+    # deleted whenever something new is written.
+    def __init__(self, cache_dir, max_size=500 * 1024 ** 2, max_age=14 * 24 * 60 * 60):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(__file__, 'rb') as source:
+            self.source_hash = hashlib.sha256(source.read()).hexdigest()
+
+    def get_key(self, chart_class, args, kwargs):
+        hasher = hashlib.sha256()
+        hasher.update(self.source_hash.encode())
+        hasher.update(chart_class.__qualname__.encode())
+        self.hash_value(hasher, args)
+        self.hash_value(hasher, sorted(kwargs.items()))
+        return hasher.hexdigest()
+
+    def hash_value(self, hasher, value):
+        if isinstance(value, np.ndarray):
+            hasher.update(f"ndarray{value.dtype}{value.shape}".encode())
+            hasher.update(np.ascontiguousarray(value).tobytes())
+        elif isinstance(value, (list, tuple)):
+            hasher.update(f"{type(value).__name__}{len(value)}(".encode())
+            for item in value:
+                self.hash_value(hasher, item)
+            hasher.update(b")")
+        elif isinstance(value, dict):
+            self.hash_value(hasher, sorted(value.items(), key=lambda item: repr(item[0])))
+        else:
+            hasher.update(repr(value).encode())
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def build(self, chart_class, *args, **kwargs):
+        path = self.get_path(self.get_key(chart_class, args, kwargs))
+        if os.path.exists(path):
+            try:
+                with open(path, 'rb') as cached:
+                    chart = pickle.load(cached)
+                os.utime(path)
+                self.hits += 1
+                return chart
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+                self.remove(path)
+
+        self.misses += 1
+        chart = chart_class(*args, **kwargs)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as cached:
+            cached.write(chart.serialize())
+        os.replace(temp_path, path)
+        self.evict()
+        return chart
+
+    def evict(self):
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Another render process evicted it first
+                continue
+            if now - stat.st_mtime > self.max_age:
+                self.remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            self.remove(path)
+            total_size -= size
+
+    def remove(self, path):
+        # Render processes share the cache, so someone else may have deleted it already
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl"):
+                self.remove(os.path.join(self.cache_dir, name))
+
+class SegmentedScene:
+
+    # Scene mixin for presentations made of independent parts. construct()
+    # runs setupSegments() and then every method named in segments, or only
+    # the one named by MANIM_SEGMENT so SegmentRenderer can render them apart.
+    # Each segment should start and end on an empty scene.
+    segments = []
+
+    def setupSegments(self):
+        pass
+
+    def construct(self):
+        self.setupSegments()
+        selected = os.environ.get("MANIM_SEGMENT")
+        for name in self.segments:
+            if selected is None or name == selected:
+                getattr(self, name)()
+
+
+def renderChunk(command, env):
+    subprocess.run(command, env=env, check=True)
+    return command
+
+class SegmentRenderer:
+
+    # Renders each segment of a SegmentedScene to its own video chunk named
+    # after a hash of that segment's code, the rest of the scene file, this
+    # file, the inputs and the render flags, then joins the chunks with ffmpeg.
+    # Unchanged chunks are reused, so editing one part only re-renders that
+    # part, and a render that dies half way resumes from the last whole chunk
+    # (manim only moves a movie to its final name once it's finished).
+    # With workers > 1 the missing chunks render at the same time, one manimgl
+    # process each (started from a thread pool), and headless=True points those at Mesa's software
+    # rasterizer (under xvfb-run when there's no display) for GPU-less machines.
+    def __init__(self, scene_file, scene_class, cache_dir, inputs=None, render_flags=(), workers=1, headless=False):
+        self.scene_file = os.path.abspath(scene_file)
+        self.scene_class = scene_class
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.inputs = inputs
+        self.render_flags = list(render_flags)
+        self.workers = workers
+        self.headless = headless
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def getSharedHash(self):
+        with open(self.scene_file, 'r') as scene_source:
+            source = scene_source.read()
+        # Segment bodies are hashed separately, so take them out of the shared part
+        for name in self.scene_class.segments:
+            source = source.replace(inspect.getsource(getattr(self.scene_class, name)), "")
+        with open(__file__, 'rb') as module_source:
+            module_hash = hashlib.sha256(module_source.read()).hexdigest()
+
+        hasher = hashlib.sha256()
+        hasher.update(source.encode())
+        hasher.update(module_hash.encode())
+        hasher.update(json.dumps(self.inputs, sort_keys=True, default=str).encode())
+        hasher.update(json.dumps(self.render_flags).encode())
+        return hasher.hexdigest()
+
+    def getSegmentHashes(self):
+        shared_hash = self.getSharedHash()
+        hashes = {}
+        for name in self.scene_class.segments:
+            hasher = hashlib.sha256(shared_hash.encode())
+            hasher.update(inspect.getsource(getattr(self.scene_class, name)).encode())
+            hashes[name] = hasher.hexdigest()[:16]
+        return hashes
+
+    def getChunkName(self, name, segment_hash):
+        return f"{self.scene_class.__name__}_{name}_{segment_hash}"
+
+    def getChunkPath(self, name, segment_hash):
+        return os.path.join(self.cache_dir, self.getChunkName(name, segment_hash) + ".mp4")
+
+    def getRenderCommand(self, name, segment_hash):
+        prefix = []
+        if self.headless and sys.platform.startswith("linux") and not os.environ.get("DISPLAY") and shutil.which("xvfb-run"):
+            prefix = ["xvfb-run", "-a"]
+        return [
+            *prefix,
+            sys.executable, "-m", "manimlib",
+            self.scene_file, self.scene_class.__name__,
+            "-w", *self.render_flags,
+            "--video_dir", self.cache_dir,
+            "--file_name", self.getChunkName(name, segment_hash),
+        ]
+
+    def getRenderEnvironment(self, name):
+        env = dict(os.environ)
+        env["MANIM_SEGMENT"] = name
+        if self.headless:
+            env["LIBGL_ALWAYS_SOFTWARE"] = "1"
+            env["GALLIUM_DRIVER"] = "llvmpipe"
+            # Split the cores between the workers instead of each rasterizer taking all of them
+            env["LP_NUM_THREADS"] = str(max(1, (os.cpu_count() or 1) // max(1, self.workers)))
+        return env
+
+    def renderSegment(self, name, segment_hash):
+        chunk_path = self.getChunkPath(name, segment_hash)
+        if not os.path.exists(chunk_path):
+            renderChunk(self.getRenderCommand(name, segment_hash), self.getRenderEnvironment(name))
+        return chunk_path
+
+    def render(self, output_path):
+        hashes = self.getSegmentHashes()
+        segments = self.scene_class.segments
+        missing = [name for name in segments if not os.path.exists(self.getChunkPath(name, hashes[name]))]
+
+        if self.workers > 1 and len(missing) > 1:
+            commands = [self.getRenderCommand(name, hashes[name]) for name in missing]
+            envs = [self.getRenderEnvironment(name) for name in missing]
+            # Each chunk is already its own manimgl process, so threads are enough to wait on them
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(missing))) as pool:
+                list(pool.map(renderChunk, commands, envs))
+
+        chunk_paths = [self.renderSegment(name, hashes[name]) for name in segments]
+        self.concatenate(chunk_paths, output_path)
+        return output_path
+
+    def concatenate(self, chunk_paths, output_path):
+        # Every chunk comes from the same encoder settings, so the streams can be copied as is
+        list_path = os.path.join(self.cache_dir, f"{self.scene_class.__name__}_chunks.txt")
+        with open(list_path, 'w') as chunk_list:
+            for chunk_path in chunk_paths:
+                chunk_list.write(f"file '{chunk_path}'\n")
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+             "-i", list_path, "-c", "copy", os.path.abspath(output_path)],
+            check=True
+        )
+
+class PolyhedronMesh:
+
+    # Shared vertices are stored once in an (n, 3) float array and the faces
+    # are an (m, 3) int index buffer into it, so subdividing or rendering
+    # never duplicates a corner.
+    def __init__(self, vertices, faces):
+        self.vertices = np.array(vertices, dtype=float)
+        self.faces = np.array(faces, dtype=int).reshape(-1, 3)
+
+    @classmethod
+    def fromEdgeLength(cls, corners, edge_length=1, error=0.000001):
+        vertices = cls.uniqueCorners(corners)
+        return cls(vertices, cls.findFaces(vertices, edge_length, error))
+
+    @classmethod
+    def icosahedron(cls, size=1):
+        # Same three golden rectangles as Icosahedron, without building the mobjects
+        golden_ratio = (1 + np.sqrt(5))/2
+        long_side = golden_ratio * size / 2
+        short_side = size / 2
+        corners = []
+        for x, y, z in [(long_side, short_side, 0), (0, long_side, short_side), (short_side, 0, long_side)]:
+            for x_sign, y_sign, z_sign in it.product([-1, 1], repeat=3):
+                corners.append([x_sign * x, y_sign * y, z_sign * z])
+        return cls.fromEdgeLength(corners, size)
+
+    @staticmethod
+    def uniqueCorners(corners, decimals=6):
+        corners = np.asarray(corners, dtype=float)
+        _, first_seen = np.unique(np.round(corners, decimals), axis=0, return_index=True)
+        return corners[np.sort(first_seen)]
+
+    @staticmethod
+    def findFaces(vertices, edge_length=1, error=0.000001):
+        # Distances between every pair of corners, computed once
+        vertices = np.asarray(vertices, dtype=float)
+        differences = vertices[:, np.newaxis, :] - vertices[np.newaxis, :, :]
+        distances = np.linalg.norm(differences, axis=2)
+        connected = np.abs(distances - edge_length) < error * edge_length
+
+        # Only look at i < j < k so each triangle is found exactly once
+        upper = np.triu(connected, k=1)
+        is_face = upper[:, :, np.newaxis] & upper[np.newaxis, :, :] & upper[:, np.newaxis, :]
+        faces = np.argwhere(is_face)
+
+        # Wind every face counter-clockwise when looked at from outside,
+        # so the normals all point away from the center
+        a, b, c = (vertices[faces[:, i]] for i in range(3))
+        normals = np.cross(b - a, c - a)
+        centers = (a + b + c) / 3
+        flipped = np.einsum("ij,ij->i", normals, centers - vertices.mean(0)) < 0
+        faces[flipped] = faces[flipped][:, [0, 2, 1]]
+        return faces
+
+    @property
+    def triangle_points(self):
+        return self.vertices[self.faces]
+
+    def getEdges(self):
+        # Every undirected edge once, as (lower index, higher index)
+        edges = self.faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+        return np.unique(np.sort(edges, axis=1), axis=0)
+
+    def getAdjacency(self):
+        # neighbors[v, :degrees[v]] are the vertices sharing an edge with v,
+        # padded with -1 when the vertices don't all have the same degree
+        edges = self.getEdges()
+        both_ways = np.concatenate([edges, edges[:, ::-1]])
+        both_ways = both_ways[np.lexsort((both_ways[:, 1], both_ways[:, 0]))]
+        degrees = np.bincount(both_ways[:, 0], minlength=len(self.vertices))
+        neighbors = np.full((len(self.vertices), degrees.max()), -1, dtype=int)
+        starts = np.concatenate([[0], np.cumsum(degrees)[:-1]])
+        slots = np.arange(len(both_ways)) - starts[both_ways[:, 0]]
+        neighbors[both_ways[:, 0], slots] = both_ways[:, 1]
+        return neighbors, degrees
+
+    def getFaceNormals(self):
+        a, b, c = (self.vertices[self.faces[:, i]] for i in range(3))
+        normals = np.cross(b - a, c - a)
+        return normals / np.linalg.norm(normals, axis=1, keepdims=True)
+
+    def getVertexNormals(self):
+        normals = np.zeros_like(self.vertices)
+        face_normals = self.getFaceNormals()
+        for i in range(3):
+            np.add.at(normals, self.faces[:, i], face_normals)
+        return normals / np.linalg.norm(normals, axis=1, keepdims=True)
+
+    def subdivide(self, levels=1, project_to_sphere=True):
+        # Geodesic subdivision, every triangle becomes four:
+        #
+        #        a
+        #       / \
+        #     ca---ab
+        #     / \ / \
+        #    c---bc---b
+        #
+        # Midpoints are made once per edge, so neighbouring faces share them.
+        vertices = self.vertices
+        faces = self.faces
+        center = vertices.mean(0)
+        radius = np.linalg.norm(vertices - center, axis=1).mean()
+
+        for _ in range(levels):
+            edges = faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+            unique_edges, edge_index = np.unique(np.sort(edges, axis=1), axis=0, return_inverse=True)
+            midpoints = vertices[unique_edges].mean(1)
+            if project_to_sphere:
+                offsets = midpoints - center
+                midpoints = center + radius * offsets / np.linalg.norm(offsets, axis=1, keepdims=True)
+
+            midpoint_index = len(vertices) + edge_index.reshape(-1, 3)
+            ab, bc, ca = midpoint_index.T
+            a, b, c = faces.T
+            faces = np.vstack([
+                np.stack([a, ab, ca], axis=1),
+                np.stack([b, bc, ab], axis=1),
+                np.stack([c, ca, bc], axis=1),
+                np.stack([ab, bc, ca], axis=1),
+            ])
+            vertices = np.vstack([vertices, midpoints])
+
+        return PolyhedronMesh(vertices, faces)
+
+    def toSurface(self, **kwargs):
+        return MeshSurface(self, **kwargs)
+
+    def toPolygons(self,
+        stroke_color=BLACK,
+        fill_color=BLUE,
+        fill_opacity=1,
+        stroke_width=0,
+        shading=(0.2,0.2,0.2),
+        **kwargs,
+    ):
+        style = dict(
+            fill_color=fill_color,
+            stroke_color=stroke_color,
+            stroke_width=stroke_width,
+            fill_opacity=fill_opacity,
+            shading=shading,
+            **kwargs
+        )
+        faces = VGroup()
+        for triangle in self.triangle_points:
+            faces.add(Polygon(*triangle, **style))
+        return VGroup3D(*faces, **style)
+
+class MeshSurface(Surface):
+
+    # One mobject for the whole mesh: the mesh vertices are the surface points
+    # and the face index buffer is handed straight to the triangle renderer.
+    def __init__(self, mesh, color=BLUE, **kwargs):
+        self.mesh = mesh
+        super().__init__(
+            color=color,
+            resolution=(len(mesh.vertices), 1),
+            prefered_creation_axis=0,
+            **kwargs
+        )
+
+    @Mobject.affects_data
+    def init_points(self):
+        points = self.mesh.vertices
+        normals = self.mesh.getVertexNormals()
+
+        # The surface shader gets its normals from cross(du, dv), so pick two
+        # tangents whose cross product is the vertex normal
+        helper = np.where(np.abs(normals[:, [2]]) < 0.9, OUT, RIGHT)
+        du = np.cross(normals, helper)
+        du /= np.linalg.norm(du, axis=1, keepdims=True)
+        dv = np.cross(normals, du)
+
+        self.set_points(points)
+        self.data['du_point'][:] = points + self.epsilon * du
+        self.data['dv_point'][:] = points + self.epsilon * dv
+
+    def compute_triangle_indices(self):
+        self.triangle_indices = self.mesh.faces.flatten()
+        return self.triangle_indices
+
 class Icosahedron(VGroup3D):
 
     def __init__(self,
@@ -287,138 +1393,40 @@ class Icosahedron(VGroup3D):
                        rectangle_3,
                        )
 
-        corner_points = VGroup()
-        for rectangle in rectangles:
-            corners = rectangle.get_all_corners()
-            corners = corners.tolist()
-            new_corners = []
-            for i, el in enumerate(corners):
-                if i % 2 == 1:
-                    new_corners.append(el)
-
-            seen_corners = []
-            for corner in corners:
-                if corner not in seen_corners:
-                    seen_corners.append(corner)
-            corners = seen_corners
-        
-            for corner in corners:
-                point = Dot((corner[0],corner[1],corner[2]))
-                corner_points.add(point)
-        self.test_dots = corner_points
-        
-        corner_positions = []
+        corner_positions = np.vstack([
+            rectangle.get_all_corners() for rectangle in rectangles
+        ])
 
-        for rectangle in rectangles:
+        # get_all_corners gives the 8 corners of the bounding box, so every
+        # corner of a flat rectangle shows up twice. The mesh keeps the first of each.
+        mesh = PolyhedronMesh.fromEdgeLength(corner_positions, size)
+        vertices = mesh.vertices
 
-            corners = rectangle.get_all_corners()   
-            corners = corners.tolist()
-            
-            for corner in corners:
-                corner_positions.append(corner)
+        corner_points = VGroup()
+        for vertex in vertices:
+            corner_points.add(Dot(vertex))
+        self.test_dots = corner_points
 
-        # All of the corners are now in a list, we now need to make the actual faces
-        # We'll make all of the posible equalateral triangles with side length 1, then get rid of all of them with duplicate centers
-        
-        triangle_points = []
-        error = 0.000001
-        for point_1 in corner_positions:
-            for point_2 in corner_positions:
-                for point_3 in corner_positions:
-                    if (self.distenceFormula(point_1,point_2) < (1 + error)*size and
-                        self.distenceFormula(point_1, point_2) > (1 - error)*size and
-                        self.distenceFormula(point_2, point_3) < (1 + error)*size and
-                        self.distenceFormula(point_2, point_3) > (1 - error)*size and
-                        self.distenceFormula(point_1,point_3) < (1 + error)*size and
-                        self.distenceFormula(point_1, point_3) > (1 - error)*size
-                    ):
-                        triangle_points.append([point_1,point_2,point_3])
-
-        # now we get rid of all duplicates
-        # Shortend triangle points needs to look like {index (0,1,2) : list of points [[x,y,z],[x,y,z],[x,y,z]]}
-
-
-        sorted_triangle_points = []
-        # Sorting all of the points by size of the x-value
-        for unsorted_corner_positions in triangle_points:
-            sorted_points = []
-            point_1 = unsorted_corner_positions[0]
-            point_2 = unsorted_corner_positions[1]
-            point_3 = unsorted_corner_positions[2]
-            if point_1[0] < point_2[0] and point_1[0] < point_3[0]:
-                sorted_points.append(point_1)
-                #sorted 1
-                if point_2[0] < point_3[0]:
-                    sorted_points.append(point_2)
-                    sorted_points.append(point_3)
-                else:
-                    sorted_points.append(point_3)
-                    sorted_points.append(point_2)
-            elif point_2[0] < point_1[0] and point_2[0] < point_3[0]:
-                sorted_points.append(point_2)
-                if point_1[0] < point_3[0]:
-                    sorted_points.append(point_1)
-                    sorted_points.append(point_3)
-                else:
-                    sorted_points.append(point_3)
-                    sorted_points.append(point_1)
-            elif point_3[0] < point_1[0] and point_3[0] < point_2[0]:
-                sorted_points.append(point_3)
-                if point_1[0] < point_2[0]:
-                    sorted_points.append(point_1)
-                    sorted_points.append(point_2)
-                else:
-                    sorted_points.append(point_2)
-                    sorted_points.append(point_1)
-            if len(sorted_points) != 0:
-                sorted_triangle_points.append(sorted_points)
-
-
-
-        '''
-        shortend_triangle_points = {}
-        seen_triangle_points = []
-        trianlge_index = 0
-        for triangle_points in sorted_triangle_points:
-            if triangle_points not in seen_triangle_points:
-                seen_triangle_points.append(triangle_points)
-                shortend_triangle_points[trianlge_index] = triangle_points
-                trianlge_index += 1
-        '''    
-
-        shortend_triangle_points = triangle_points.copy()
-
-        print("Number of triangles")
-        print(len(shortend_triangle_points))
-        
-        
+        # Every face is an equalateral triangle with side length 1 (times size)
+        face_indices = mesh.faces
+        triangle_points = mesh.triangle_points
 
-    
         faces = VGroup()
+        for triangle in triangle_points:
+            faces.add(Polygon(*triangle, **style))
 
-        for i in range(len(shortend_triangle_points)):
-            poly = Polygon(
-                np.array([shortend_triangle_points[i][0][0],shortend_triangle_points[i][0][1],shortend_triangle_points[i][0][2]]),
-                np.array([shortend_triangle_points[i][1][0],shortend_triangle_points[i][1][1],shortend_triangle_points[i][1][2]]),
-                np.array([shortend_triangle_points[i][2][0],shortend_triangle_points[i][2][1],shortend_triangle_points[i][2][2]]),
-                **style,
-            )
-            faces.add(poly)
-            
-        super().__init__(*faces,**style)
-
-        """
-        self.apply_depth_test()
-        self.set_gloss(0.5)
-        self.set_shadow(0.5)
-        self.set_reflectiveness(0.2)
-
-        self.faces = faces
-        self.verticies = corner_points
-        self.triangle_points = shortend_triangle_points
+        super().__init__(*faces, **style)
+
+        self.faces = face_indices
+        self.vertices = vertices
+        self.triangle_points = triangle_points
         self.corner_positions = corner_positions
         self.rectangles = rectangles
-        """
+        self.mesh = mesh
+
+    def getMesh(self, levels=0):
+        return self.mesh.subdivide(levels) if levels > 0 else self.mesh
+
     def distenceFormula(self, point_1, point_2):
         return (np.sqrt(
             ((point_1[0] - point_2[0]) ** 2) +
@@ -432,10 +1440,68 @@ class Icosahedron(VGroup3D):
     
     def facesCreation(self):
         creation_animations = []
-        for triangle in self.faces:
+        for triangle in self.submobjects:
             creation_animations.append(ShowCreation(triangle))
         return creation_animations
 
+class AntSwarm(DotCloud):
+
+    # Every ant as one point of a single DotCloud instead of a Dot and an
+    # updater each. An ant is always on a vertex or part way along an edge, so
+    # a frame is just the vertices the ants are leaving, the ones they're
+    # heading to and how far along they are, and the positions for all of them
+    # come out of one lerp over vertex_positions.
+    def __init__(self, vertex_positions, start_vertices, color=RED, radius=0.02, **kwargs):
+        self.vertex_positions = np.array(vertex_positions, dtype=float)
+        self.from_vertices = np.asarray(start_vertices)
+        self.to_vertices = self.from_vertices
+        self.progress = 0
+        self.playback_time = 0
+        super().__init__(
+            points=self.vertex_positions[self.from_vertices],
+            color=color,
+            radius=radius,
+            **kwargs
+        )
+
+    def set_positions(self, positions):
+        # Same number of ants every frame, so write straight into the point
+        # buffer instead of going through set_points and resizing
+        if len(positions) != self.get_num_points():
+            return self.set_points(positions)
+        self.data['point'][:] = positions
+        self.refresh_bounding_box()
+        self.note_changed_data()
+        return self
+
+    def set_step(self, from_vertices, to_vertices, progress=0):
+        self.from_vertices = np.asarray(from_vertices)
+        self.to_vertices = np.asarray(to_vertices)
+        return self.set_progress(progress)
+
+    def set_progress(self, progress):
+        self.progress = progress
+        start = self.vertex_positions[self.from_vertices]
+        end = self.vertex_positions[self.to_vertices]
+        return self.set_positions(start + progress * (end - start))
+
+    def follow_trajectory(self, trajectory, steps_per_second=2):
+        # Plays a recorded run (anything with len() and getFrame(i), like an
+        # AntTrajectory) back in scene time, only reading the two frames the
+        # ants are between
+        self.playback_time = 0
+
+        def update_swarm(swarm, dt):
+            swarm.playback_time += dt
+            step = swarm.playback_time * steps_per_second
+            index = min(int(step), len(trajectory) - 2)
+            progress = min(step - index, 1)
+            swarm.set_step(trajectory.getFrame(index), trajectory.getFrame(index + 1), progress)
+
+        if len(trajectory) > 1:
+            self.add_updater(update_swarm)
+        return self
+
 class ThreeDTesting(ThreeDScene):
     def construct(self):
     